@@ -1,83 +1,217 @@
-import json
-import base64
-from typing import Any, Dict, Optional
+import orjson
+import binascii
+import hashlib
+import hmac
+import logging
+import math
+import os
+from typing import Any, Dict, Optional, Union
 import time
+import numpy as np
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+logger = logging.getLogger(__name__)
 
 class SimpleEncryption:
     """简单的对称加密工具 - 与前端对应"""
     
     KEY = 'mtg-ai-2024-secret-key-12345'  # 16字节密钥
     IV = 'mtg-ai-iv-2024'  # 16字节初始向量
+    AES_VERSION = '2.0'  # 使用AES-GCM加密的客户端协议版本
+    
+    @staticmethod
+    def _key_tile(key: Union[str, bytes]) -> np.ndarray:
+        """获取平铺后的密钥缓冲区，默认密钥直接复用预先计算的结果"""
+        if key in (_KEY_BYTES, SimpleEncryption.KEY):
+            return _KEY_TILE
+        if isinstance(key, str):
+            key = key.encode('utf-8')
+        return _build_key_tile(key)
+    
+    @staticmethod
+    def _xor(data_bytes: bytes, key_tile: np.ndarray) -> Union[bytes, memoryview]:
+        """向量化XOR：数据按密钥缓冲区长度分块，与平铺密钥逐块异或
+
+        密钥缓冲区长度是密钥长度和8的公倍数，所以每块都从密钥开头对齐，
+        不需要逐字节取模，且整块部分可以按uint64宽字处理。
+        小于_SWAR_MAX_SIZE的数据直接用Python大整数一次性异或。
+        大数据返回结果缓冲区的memoryview，调用方按需复制，避免多余的拷贝。
+        """
+        n = len(data_bytes)
+        if n < _SWAR_MAX_SIZE:
+            # 小数据：NumPy调用开销占主导，改用一次大整数XOR
+            key_bytes = _KEY_TILE_BYTES[:n] if key_tile is _KEY_TILE else key_tile[:n].tobytes()
+            xored = int.from_bytes(data_bytes, 'little') ^ int.from_bytes(key_bytes, 'little')
+            return xored.to_bytes(n, 'little')
+        
+        data_arr = np.frombuffer(data_bytes, dtype=np.uint8)
+        tile_size = len(key_tile)
+        result = np.empty_like(data_arr)
+        blocks = len(data_arr) // tile_size
+        bulk = blocks * tile_size
+        if blocks:
+            np.bitwise_xor(data_arr[:bulk].view(np.uint64).reshape(blocks, -1), key_tile.view(np.uint64),
+                           out=result[:bulk].view(np.uint64).reshape(blocks, -1))
+        tail = len(data_arr) - bulk
+        np.bitwise_xor(data_arr[bulk:], key_tile[:tail], out=result[bulk:])
+        return memoryview(result)
+    
+    @staticmethod
+    def _xor_bytes(data_bytes: bytes, key_tile: np.ndarray) -> bytes:
+        """XOR并返回bytes"""
+        result = SimpleEncryption._xor(data_bytes, key_tile)
+        return result if isinstance(result, bytes) else result.tobytes()
     
     @staticmethod
-    def string_to_bytes(s: str) -> bytes:
-        """字符串转字节数组"""
-        return s.encode('utf-8')
+    def _xor_b64(data_bytes: bytes, key: Union[str, bytes]) -> bytes:
+        """对字节数据做XOR加密，返回base64编码后的ASCII字节"""
+        result = SimpleEncryption._xor(data_bytes, SimpleEncryption._key_tile(key))
+        return binascii.b2a_base64(result, newline=False)
     
     @staticmethod
-    def bytes_to_string(b: bytes) -> str:
-        """字节数组转字符串"""
-        return b.decode('utf-8')
+    def xor_encrypt_bytes(data_bytes: bytes, key: Union[str, bytes]) -> str:
+        """对字节数据做XOR加密并base64编码"""
+        return SimpleEncryption._xor_b64(data_bytes, key).decode('ascii')
     
     @staticmethod
-    def xor_encrypt(data: str, key: str) -> str:
+    def xor_decrypt_bytes(encrypted_data: str, key: Union[str, bytes]) -> bytes:
+        """base64解码后做XOR解密，返回原始字节"""
+        encrypted_bytes = binascii.a2b_base64(encrypted_data)
+        return SimpleEncryption._xor_bytes(encrypted_bytes, SimpleEncryption._key_tile(key))
+    
+    @staticmethod
+    def xor_encrypt(data: str, key: Union[str, bytes]) -> str:
         """简单的XOR加密"""
-        data_bytes = SimpleEncryption.string_to_bytes(data)
-        key_bytes = SimpleEncryption.string_to_bytes(key)
-        result = bytearray(len(data_bytes))
-        
-        for i in range(len(data_bytes)):
-            result[i] = data_bytes[i] ^ key_bytes[i % len(key_bytes)]
-        
-        return base64.b64encode(bytes(result)).decode('utf-8')
+        return SimpleEncryption.xor_encrypt_bytes(data.encode('utf-8'), key)
     
     @staticmethod
-    def xor_decrypt(encrypted_data: str, key: str) -> str:
+    def xor_decrypt(encrypted_data: str, key: Union[str, bytes]) -> str:
         """简单的XOR解密"""
-        encrypted_bytes = base64.b64decode(encrypted_data.encode('utf-8'))
-        key_bytes = SimpleEncryption.string_to_bytes(key)
-        result = bytearray(len(encrypted_bytes))
-        
-        for i in range(len(encrypted_bytes)):
-            result[i] = encrypted_bytes[i] ^ key_bytes[i % len(key_bytes)]
-        
-        return SimpleEncryption.bytes_to_string(bytes(result))
+        return SimpleEncryption.xor_decrypt_bytes(encrypted_data, key).decode('utf-8')
+    
+    @staticmethod
+    def encrypt_raw(json_bytes: bytes) -> str:
+        """加密已序列化的JSON字节（不再重复解析和序列化）"""
+        return SimpleEncryption.xor_encrypt_bytes(json_bytes, _KEY_BYTES)
     
     @staticmethod
     def encrypt(data: Any) -> str:
         """加密数据"""
-        json_string = json.dumps(data, ensure_ascii=False)
-        return SimpleEncryption.xor_encrypt(json_string, SimpleEncryption.KEY)
+        return SimpleEncryption.encrypt_raw(orjson.dumps(data))
+    
+    @staticmethod
+    def decrypt_bytes(encrypted_data: str) -> bytes:
+        """解密数据，返回JSON原始字节（不做解析）
+
+        不缓存结果：密文长度由客户端决定，明文里还可能带有用户的api_key，
+        缓存会在内存里长期保留这些内容。
+        """
+        return SimpleEncryption.xor_decrypt_bytes(encrypted_data, _KEY_BYTES)
     
     @staticmethod
     def decrypt(encrypted_data: str) -> Any:
-        """解密数据"""
-        decrypted_string = SimpleEncryption.xor_decrypt(encrypted_data, SimpleEncryption.KEY)
-        return json.loads(decrypted_string)
+        """解密数据（每次解析出新的对象，调用方可以随意修改）"""
+        return orjson.loads(SimpleEncryption.decrypt_bytes(encrypted_data))
+    
+    @staticmethod
+    def encrypt_aes_raw(json_bytes: bytes) -> str:
+        """AES-GCM加密已序列化的JSON字节，随机nonce放在密文前面，认证标签在密文末尾"""
+        nonce = os.urandom(_AES_NONCE_BYTES)
+        ciphertext = _AES_GCM.encrypt(nonce, json_bytes, None)
+        return binascii.b2a_base64(nonce + ciphertext, newline=False).decode('ascii')
+    
+    @staticmethod
+    def encrypt_aes(data: Any) -> str:
+        """AES-GCM加密数据，随机nonce放在密文前面"""
+        return SimpleEncryption.encrypt_aes_raw(orjson.dumps(data))
+    
+    @staticmethod
+    def decrypt_aes_bytes(encrypted_data: str) -> bytes:
+        """AES-GCM解密数据，返回JSON原始字节（不做解析）
+
+        认证标签校验失败（密文被篡改或密钥不匹配）时抛出ValueError。
+        """
+        raw = binascii.a2b_base64(encrypted_data)
+        if len(raw) < _AES_NONCE_BYTES + _AES_TAG_BYTES:
+            raise ValueError("AES密文长度不足")
+        try:
+            return _AES_GCM.decrypt(raw[:_AES_NONCE_BYTES], raw[_AES_NONCE_BYTES:], None)
+        except InvalidTag:
+            raise ValueError("AES密文校验失败") from None
+    
+    @staticmethod
+    def decrypt_aes(encrypted_data: str) -> Any:
+        """AES-GCM解密数据"""
+        return orjson.loads(SimpleEncryption.decrypt_aes_bytes(encrypted_data))
+    
+    @staticmethod
+    def generate_signature_bytes(json_bytes: bytes, timestamp: int) -> str:
+        """基于已序列化的JSON字节生成请求签名
+
+        签名只取密文base64的前16个字符，即只依赖前12个字节，
+        所以只截取这12个字节做XOR和编码，不再处理整个载荷。
+        计算本身是常数时间，不需要缓存（缓存键要对整个载荷做哈希，反而更慢）。
+        """
+        head = json_bytes[:_SIGNATURE_BYTES]
+        if len(head) < _SIGNATURE_BYTES:
+            head = (head + str(timestamp).encode('ascii'))[:_SIGNATURE_BYTES]
+        return SimpleEncryption._xor_b64(head, _KEY_BYTES)[:16].decode('ascii')
     
     @staticmethod
     def generate_signature(data: Any, timestamp: int) -> str:
         """生成请求签名"""
-        data_string = json.dumps(data, ensure_ascii=False) + str(timestamp)
-        return SimpleEncryption.xor_encrypt(data_string, SimpleEncryption.KEY)[:16]
+        return SimpleEncryption.generate_signature_bytes(orjson.dumps(data), timestamp)
+    
+    @staticmethod
+    def verify_signature_bytes(json_bytes: bytes, timestamp: int, signature: str) -> bool:
+        """基于已序列化的JSON字节验证请求签名"""
+        try:
+            expected_signature = SimpleEncryption.generate_signature_bytes(json_bytes, timestamp)
+            return hmac.compare_digest(signature, expected_signature)
+        except (TypeError, ValueError) as e:
+            logger.debug("签名验证错误: %s", e)
+            return False
     
     @staticmethod
     def verify_signature(data: Any, timestamp: int, signature: str) -> bool:
         """验证请求签名"""
         try:
-            expected_signature = SimpleEncryption.generate_signature(data, timestamp)[:16]
-            return signature == expected_signature
-        except Exception as e:
-            print(f"签名验证错误: {e}")
+            return SimpleEncryption.verify_signature_bytes(orjson.dumps(data), timestamp, signature)
+        except (TypeError, ValueError) as e:
+            logger.debug("签名验证错误: %s", e)
             return False
     
     @staticmethod
     def verify_timestamp(timestamp: int, max_age: int = 300000) -> bool:
         """验证时间戳（防止重放攻击）"""
-        try:
-            current_time = int(time.time() * 1000)  # 毫秒时间戳
-            time_diff = abs(current_time - timestamp)
-            return time_diff < max_age  # 默认5分钟内有效
-        except Exception as e:
-            print(f"时间戳验证错误: {e}")
+        if not isinstance(timestamp, (int, float)):
+            logger.debug("时间戳验证错误: 无效的时间戳 %r", timestamp)
             return False
+        current_time = time.time_ns() // 1_000_000  # 毫秒时间戳
+        time_diff = abs(current_time - timestamp)
+        return time_diff < max_age  # 默认5分钟内有效
+
+
+_TILE_MIN_SIZE = 4096
+_SWAR_MAX_SIZE = 512  # 低于此长度时大整数XOR比NumPy更快
+_SIGNATURE_BYTES = 12  # 16个base64字符对应的字节数
+
+
+def _build_key_tile(key_bytes: bytes) -> np.ndarray:
+    """把密钥重复平铺成不小于4KB、长度为lcm(密钥长度, 8)整数倍的缓冲区"""
+    period = math.lcm(len(key_bytes), 8)
+    tile_size = period * -(-_TILE_MIN_SIZE // period)
+    key_arr = np.frombuffer(key_bytes, dtype=np.uint8)
+    return np.resize(key_arr, tile_size)
+
+
+# 默认密钥只需编码和平铺一次
+_KEY_BYTES = SimpleEncryption.KEY.encode('utf-8')
+_KEY_TILE = _build_key_tile(_KEY_BYTES)
+_KEY_TILE_BYTES = _KEY_TILE.tobytes()
+
+# AES-GCM使用由默认密钥派生的256位密钥（OpenSSL实现，支持AES-NI加速）
+_AES_NONCE_BYTES = 12
+_AES_TAG_BYTES = 16
+_AES_GCM = AESGCM(hashlib.sha256(_KEY_BYTES).digest())
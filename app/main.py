@@ -1,24 +1,127 @@
 ﻿from fastapi import FastAPI, HTTPException, Request
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from contextlib import asynccontextmanager
+from pydantic import BaseModel, ConfigDict, Field
+from cachetools import TTLCache
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, wait_exponential_jitter
 import httpx
+import functools
+import hashlib
+import hmac
+import logging
+import logging.handlers
+import math
+import orjson
 import os
+import queue
+import re
 import asyncio
-import random
+import time
 from typing import List, Optional
 from .preprocessor import preprocess_mtg_query, mtg_preprocessor
 
+logger = logging.getLogger(__name__)
+
+# 上游连接池配置：所有请求共享连接，复用keep-alive / HTTP2连接，避免每次重新握手
+# 空闲连接保留30秒（默认5秒），最多保留50个空闲连接，并发突发之间不必重新建立连接
+_HTTP_KEEPALIVE_EXPIRY = 30.0
+_HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50, keepalive_expiry=_HTTP_KEEPALIVE_EXPIRY)
+# 统一的默认超时，单个调用仍可按需覆盖；连接超时较短，连不上时尽快重试
+_HTTP_CONNECT_TIMEOUT = 1.0
+_HTTP_TIMEOUT = httpx.Timeout(30.0, connect=_HTTP_CONNECT_TIMEOUT)
+
+# 上游调用重试：网络错误、429和5xx最多尝试3次，指数退避加随机抖动
+_RETRY_ATTEMPTS = 3
+_RETRY_BACKOFF = wait_exponential_jitter(initial=0.1, max=1.0)
+_RETRY_AFTER_MAX = 5.0  # 429响应的Retry-After最多等待的秒数
+
+def _is_retryable(exc: BaseException) -> bool:
+    """只重试临时性错误，其余4xx直接失败"""
+    if isinstance(exc, httpx.TransportError):
+        return True
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        return status == 429 or status >= 500
+    return False
+
+def _retry_wait(retry_state) -> float:
+    """429优先按Retry-After等待，否则使用指数退避"""
+    exc = retry_state.outcome.exception()
+    if isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code == 429:
+        try:
+            return min(float(exc.response.headers["Retry-After"]), _RETRY_AFTER_MAX)
+        except (KeyError, ValueError):
+            pass
+    return _RETRY_BACKOFF(retry_state)
+
+async def _send_with_retry(client: httpx.AsyncClient, method: str, url: str, timeout: float, **kwargs) -> httpx.Response:
+    """发送上游请求，临时性错误自动重试；timeout为读取超时，连接超时统一使用较短的值"""
+    # JSON请求体用orjson序列化一次，重试时复用：比标准库json快，中文提示词按UTF-8发送而不是\uXXXX转义
+    # （调用方已在headers中设置Content-Type）
+    if "json" in kwargs:
+        kwargs["content"] = orjson.dumps(kwargs.pop("json"))
+    async for attempt in AsyncRetrying(
+        retry=retry_if_exception(_is_retryable),
+        stop=stop_after_attempt(_RETRY_ATTEMPTS),
+        wait=_retry_wait,
+        reraise=True
+    ):
+        with attempt:
+            response = await client.request(
+                method, url, timeout=httpx.Timeout(timeout, connect=_HTTP_CONNECT_TIMEOUT), **kwargs
+            )
+            if response.status_code == 429 or response.status_code >= 500:
+                response.raise_for_status()
+    return response
+
+# 应用日志级别，默认只输出警告和错误
+_LOG_LEVEL = os.getenv("LOG_LEVEL", "WARNING").upper()
+
+def _start_log_listener() -> tuple[logging.handlers.QueueHandler, logging.handlers.QueueListener]:
+    """应用日志经队列交给后台线程写出，事件循环不会阻塞在stderr写入上"""
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    app_logger = logging.getLogger("app")
+    app_logger.setLevel(_LOG_LEVEL)
+    app_logger.addHandler(queue_handler)
+    app_logger.propagate = False
+    listener.start()
+    return queue_handler, listener
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动时创建共享的httpx客户端和日志线程，关闭时释放"""
+    log_handler, log_listener = _start_log_listener()
+    app.state.ai_client = httpx.AsyncClient(limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT, http2=True)
+    app.state.scryfall_client = httpx.AsyncClient(
+        base_url=scryfall_service.base_url,
+        headers=scryfall_service.headers,
+        limits=_HTTP_LIMITS,
+        timeout=_HTTP_TIMEOUT,
+        http2=True
+    )
+    ai_service.client = app.state.ai_client
+    scryfall_service.client = app.state.scryfall_client
+    try:
+        yield
+    finally:
+        await app.state.ai_client.aclose()
+        await app.state.scryfall_client.aclose()
+        log_listener.stop()
+        logging.getLogger("app").removeHandler(log_handler)
+
 
-app = FastAPI(title="MTG AI Search API", version="1.0.0")
+app = FastAPI(title="MTG AI Search API", version="1.0.0", default_response_class=ORJSONResponse, lifespan=lifespan)
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     """自定义422验证错误处理器"""
-    print(f"422验证错误: {exc.errors()}")
-    print(f"请求路径: {request.url}")
-    print(f"请求方法: {request.method}")
+    logger.warning("422验证错误: %s，请求: %s %s", exc.errors(), request.method, request.url)
     
     return JSONResponse(
         status_code=422,
@@ -33,19 +136,30 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     )
 
 # CORS configuration
+# 允许的来源可通过ALLOWED_ORIGINS（逗号分隔）覆盖；接口不使用Cookie，无需携带凭据
+_DEFAULT_ALLOWED_ORIGINS = "https://mtg-ai-frontend.onrender.com,http://localhost:3000,http://localhost:5173"
+_ALLOWED_ORIGINS = [origin.strip() for origin in os.getenv("ALLOWED_ORIGINS", _DEFAULT_ALLOWED_ORIGINS).split(",") if origin.strip()]
+_CORS_MAX_AGE = 86400  # 浏览器缓存预检结果一天，避免每个跨域POST都先发OPTIONS
+
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["https://mtg-ai-frontend.onrender.com", "http://localhost:3000", "http://localhost:5173"],
-    allow_credentials=True,
-    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    allow_headers=["*"],
+    allow_origins=_ALLOWED_ORIGINS,
+    allow_methods=["GET", "POST", "OPTIONS"],
+    # 只放行前端实际发送的请求头（Accept/Content-Type等CORS安全头始终允许）
+    allow_headers=["Authorization", "Content-Type", "X-Client-Version"],
+    max_age=_CORS_MAX_AGE,
 )
 
 
 
 # 数据模型
+# 查询长度上限：过长的输入既浪费AI token，也会让提示词缓存失效
+_MAX_QUERY_LENGTH = 256
+
 class SearchRequest(BaseModel):
-    query: str
+    model_config = ConfigDict(extra="ignore")  # 前端多传的字段直接忽略
+
+    query: str = Field(..., max_length=_MAX_QUERY_LENGTH)
     language: str = "zh"
     api_key: Optional[str] = None
     model: Optional[str] = None
@@ -54,8 +168,12 @@ class SearchRequest(BaseModel):
     order: Optional[str] = "asc"  # 排序顺序：asc, desc
     page: Optional[int] = 1  # 页码，从1开始
     page_size: Optional[int] = 30  # 每页显示的卡牌数量
+    compact: bool = False  # 列表视图不需要完整规则文本时，返回的oracle_text为空字符串
 
+# 响应模型只用于接口文档，实例构建后不再修改
 class Card(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     name: str
     mana_cost: Optional[str] = None
     type_line: str
@@ -65,6 +183,8 @@ class Card(BaseModel):
     rarity: Optional[str] = None
 
 class SearchResponse(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     cards: List[Card]
     scryfall_query: str
     total_cards: int
@@ -80,53 +200,147 @@ class SearchResponse(BaseModel):
 
 
 
+# 固定内容的响应体，启动时序列化一次
+_ROOT_RESPONSE = orjson.dumps({"message": "MTG AI Search API", "version": "1.0.0"})
+_HEALTH_RESPONSE = orjson.dumps({"status": "healthy"})
+
+@app.get("/")
+async def root():
+    """API根路径"""
+    return Response(content=_ROOT_RESPONSE, media_type="application/json")
+
+@app.get("/health")
+async def health_check():
+    """健康检查（Docker / Render 使用）"""
+    return Response(content=_HEALTH_RESPONSE, media_type="application/json")
+
+# 搜索示例是固定内容，启动时序列化一次
+_EXAMPLES_RESPONSE = orjson.dumps({
+    "zh": [
+        "绿色生物",
+        "红色瞬间", 
+        "蓝色瞬间",
+        "瞬间法术",
+        "力量大于4的生物",
+        "神话稀有度",
+        "艾斯波控制",
+        "2/2熊",
+        "清场法术"
+    ],
+    "en": [
+        "green creatures",
+        "red instants",
+        "blue instants",
+        "instant spells",
+        "creatures with power 4+",
+        "mythic rarity",
+        "esper control",
+        "2/2 bears",
+        "board wipes"
+    ]
+})
+
 @app.get("/api/examples")
 async def get_search_examples():
     """获取搜索示例"""
-    examples = {
-        "zh": [
-            "绿色生物",
-            "红色瞬间", 
-            "蓝色瞬间",
-            "瞬间法术",
-            "力量大于4的生物",
-            "神话稀有度",
-            "艾斯波控制",
-            "2/2熊",
-            "清场法术"
-        ],
-        "en": [
-            "green creatures",
-            "red instants",
-            "blue instants",
-            "instant spells",
-            "creatures with power 4+",
-            "mythic rarity",
-            "esper control",
-            "2/2 bears",
-            "board wipes"
-        ]
-    }
-    return examples
+    return Response(content=_EXAMPLES_RESPONSE, media_type="application/json")
+
+# 模型列表缓存：上游列表很少变化，10分钟内直接返回缓存结果
+_MODELS_CACHE_TTL = 600
+_models_cache = TTLCache(maxsize=8, ttl=_MODELS_CACHE_TTL)
+# 最近一次成功获取的结果，上游出错时返回（即使已过期）
+_models_stale = {}
+# 缓存未命中时只让一个请求访问上游，其余请求等待后复用结果
+_models_lock = asyncio.Lock()
+# 过期后正在后台刷新的任务（同时持有任务引用，防止被回收）
+_models_refreshing = {}
+# 上游获取失败后的退避窗口：窗口内不再重新请求上游，避免持续冲击出错的服务
+_MODELS_FAILURE_BACKOFF = 60
+_models_failed = TTLCache(maxsize=8, ttl=_MODELS_FAILURE_BACKOFF)
+
+# 各提供商对应的API密钥环境变量
+_MODELS_API_KEY_ENV = {
+    "aihubmix": "AIHUBMIX_API_KEY",
+    "openai": "OPENAI_API_KEY",
+    "google": "GOOGLE_API_KEY",
+    "anthropic": "ANTHROPIC_API_KEY"
+}
+
+def _models_cache_key(provider: str) -> str:
+    """缓存键：提供商 + API密钥的哈希（密钥变更后自动失效，且不在内存中保存明文）"""
+    api_key = os.getenv(_MODELS_API_KEY_ENV.get(provider, ""), "")
+    return hashlib.sha256(f"{provider}|{api_key}".encode('utf-8')).hexdigest()
+
+def clear_models_cache():
+    """清空模型列表缓存"""
+    _models_cache.clear()
+    _models_stale.clear()
+    _models_failed.clear()
 
 @app.get("/api/models")
 async def get_models(provider: str = "aihubmix"):
     """获取可用的AI模型列表"""
+    cache_key = _models_cache_key(provider)
+    cached = _models_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    # 缓存过期但有旧结果：立即返回旧结果，后台刷新（stale-while-revalidate）
+    stale = _models_stale.get(cache_key)
+    if stale is not None:
+        if cache_key not in _models_refreshing and cache_key not in _models_failed:
+            task = asyncio.create_task(_refresh_models(cache_key, provider))
+            _models_refreshing[cache_key] = task
+            task.add_done_callback(lambda _: _models_refreshing.pop(cache_key, None))
+        return stale
+    
+    async with _models_lock:
+        # 等锁期间可能已有其他请求填充了缓存
+        cached = _models_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        if cache_key in _models_failed:
+            return _default_models_response(provider)
+        result = await _refresh_models(cache_key, provider)
+        if result is None:
+            # 返回该提供商的默认模型列表
+            return _default_models_response(provider)
+        return result
+
+async def _refresh_models(cache_key: str, provider: str):
+    """从上游获取模型列表并写入缓存，失败时记录退避窗口并返回None"""
     try:
-        if provider == "aihubmix":
-            return await _get_aihubmix_models()
-        elif provider == "openai":
-            return await _get_openai_models()
-        elif provider == "google":
-            return await _get_google_models()
-        elif provider == "anthropic":
-            return await _get_anthropic_models()
-        else:
-            raise Exception(f"不支持的提供商: {provider}")
+        result = await _fetch_models(provider)
     except Exception as e:
-        print(f"Error fetching models for {provider}: {e}")
-        # 返回该提供商的默认模型列表
-        return {"models": _get_default_models(provider)}
+        logger.warning("Error fetching models for %s: %s", provider, e)
+        _models_failed[cache_key] = True
+        return None
+    _models_cache[cache_key] = result
+    _models_stale[cache_key] = result
+    return result
+
+async def _fetch_models(provider: str):
+    """从上游获取指定提供商的模型列表"""
+    if provider == "aihubmix":
+        return await _get_aihubmix_models()
+    elif provider == "openai":
+        return await _get_openai_models()
+    elif provider == "google":
+        return await _get_google_models()
+    elif provider == "anthropic":
+        return await _get_anthropic_models()
+    else:
+        raise Exception(f"不支持的提供商: {provider}")
+
+# model_id前缀 → 提供商，其余归为aihubmix
+_MODEL_ID_PROVIDERS = (("gpt-", "openai"), ("claude-", "anthropic"), ("gemini-", "google"))
+
+def _infer_model_provider(model_id: str) -> str:
+    """从model_id推断提供商"""
+    for prefix, provider in _MODEL_ID_PROVIDERS:
+        if model_id.startswith(prefix):
+            return provider
+    return "aihubmix"
 
 async def _get_aihubmix_models():
     """从AIHubMix获取模型列表"""
@@ -134,43 +348,31 @@ async def _get_aihubmix_models():
     if not aihubmix_api_key:
         raise Exception("AIHubMix API密钥未配置")
     
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            "https://aihubmix.com/v1/models",
-            headers={
-                "Authorization": f"Bearer {aihubmix_api_key}",
-                "Content-Type": "application/json"
-            },
-            timeout=15.0
-        )
-        
-        if response.status_code == 200:
-            data = response.json()
-            models = []
-            model_data = data.get("data", [])
-            
-            for model in model_data:
-                model_id = model.get("id")
-                if model_id:
-                    model_name = model.get("name", model_id)
-                    # 从model_id推断提供商
-                    provider = "aihubmix"
-                    if model_id.startswith("gpt-"):
-                        provider = "openai"
-                    elif model_id.startswith("claude-"):
-                        provider = "anthropic"
-                    elif model_id.startswith("gemini-"):
-                        provider = "google"
-                    
-                    models.append({
-                        "id": model_id,
-                        "name": model_name,
-                        "provider": provider
-                    })
-            
-            return {"models": models}
-        else:
-            raise Exception(f"AIHubMix API返回错误: {response.status_code}")
+    client = app.state.ai_client
+    response = await _send_with_retry(
+        client, "GET",
+        "https://aihubmix.com/v1/models",
+        headers={
+            "Authorization": f"Bearer {aihubmix_api_key}",
+            "Content-Type": "application/json"
+        },
+        timeout=15.0
+    )
+    
+    if response.status_code == 200:
+        data = orjson.loads(response.content)
+        models = [
+            {
+                "id": model["id"],
+                "name": model.get("name", model["id"]),
+                "provider": _infer_model_provider(model["id"])
+            }
+            for model in data.get("data", [])
+            if model.get("id")
+        ]
+        return {"models": models}
+    else:
+        raise Exception(f"AIHubMix API返回错误: {response.status_code}")
 
 async def _get_openai_models():
     """从OpenAI获取模型列表"""
@@ -178,32 +380,32 @@ async def _get_openai_models():
     if not openai_api_key:
         raise Exception("OpenAI API密钥未配置")
     
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            "https://api.openai.com/v1/models",
-            headers={
-                "Authorization": f"Bearer {openai_api_key}",
-                "Content-Type": "application/json"
-            },
-            timeout=15.0
-        )
-        
-        if response.status_code == 200:
-            data = response.json()
-            models = []
-            # OpenAI模型过滤，只包含GPT模型
-            gpt_models = [model for model in data.get("data", []) 
-                         if model.get("id", "").startswith(("gpt-", "gpt-4o"))]
-            
-            for model in gpt_models:
-                models.append({
-                    "id": model.get("id", ""),
-                    "name": model.get("id", "").replace("-", " ").title(),
-                    "provider": "openai"
-                })
-            return {"models": models}
-        else:
-            raise Exception(f"OpenAI API返回错误: {response.status_code}")
+    client = app.state.ai_client
+    response = await _send_with_retry(
+        client, "GET",
+        "https://api.openai.com/v1/models",
+        headers={
+            "Authorization": f"Bearer {openai_api_key}",
+            "Content-Type": "application/json"
+        },
+        timeout=15.0
+    )
+    
+    if response.status_code == 200:
+        data = orjson.loads(response.content)
+        # OpenAI模型过滤，只包含GPT模型
+        models = [
+            {
+                "id": model["id"],
+                "name": model["id"].replace("-", " ").title(),
+                "provider": "openai"
+            }
+            for model in data.get("data", [])
+            if model.get("id", "").startswith(("gpt-", "gpt-4o"))
+        ]
+        return {"models": models}
+    else:
+        raise Exception(f"OpenAI API返回错误: {response.status_code}")
 
 async def _get_google_models():
     """从Google获取模型列表"""
@@ -211,33 +413,32 @@ async def _get_google_models():
     if not google_api_key:
         raise Exception("Google API密钥未配置")
     
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            "https://generativelanguage.googleapis.com/v1beta/models",
-            headers={
-                "x-goog-api-key": google_api_key,
-                "Content-Type": "application/json"
-            },
-            timeout=15.0
-        )
-        
-        if response.status_code == 200:
-            data = response.json()
-            models = []
-            # Google模型过滤，只包含Gemini模型
-            gemini_models = [model for model in data.get("models", []) 
-                            if model.get("name", "").startswith("models/gemini")]
-            
-            for model in gemini_models:
-                model_id = model.get("name", "").replace("models/", "")
-                models.append({
-                    "id": model_id,
-                    "name": model_id.replace("-", " ").title(),
-                    "provider": "google"
-                })
-            return {"models": models}
-        else:
-            raise Exception(f"Google API返回错误: {response.status_code}")
+    client = app.state.ai_client
+    response = await _send_with_retry(
+        client, "GET",
+        "https://generativelanguage.googleapis.com/v1beta/models",
+        headers={
+            "x-goog-api-key": google_api_key,
+            "Content-Type": "application/json"
+        },
+        timeout=15.0
+    )
+    
+    if response.status_code == 200:
+        data = orjson.loads(response.content)
+        # Google模型过滤，只包含Gemini模型
+        model_ids = [
+            model["name"].replace("models/", "")
+            for model in data.get("models", [])
+            if model.get("name", "").startswith("models/gemini")
+        ]
+        models = [
+            {"id": model_id, "name": model_id.replace("-", " ").title(), "provider": "google"}
+            for model_id in model_ids
+        ]
+        return {"models": models}
+    else:
+        raise Exception(f"Google API返回错误: {response.status_code}")
 
 async def _get_anthropic_models():
     """从Anthropic获取模型列表"""
@@ -245,63 +446,71 @@ async def _get_anthropic_models():
     if not anthropic_api_key:
         raise Exception("Anthropic API密钥未配置")
     
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            "https://api.anthropic.com/v1/models",
-            headers={
-                "x-api-key": anthropic_api_key,
-                "Content-Type": "application/json",
-                "anthropic-version": "2023-06-01"
-            },
-            timeout=15.0
-        )
-        
-        if response.status_code == 200:
-            data = response.json()
-            models = []
-            # Anthropic模型过滤，只包含Claude模型
-            claude_models = [model for model in data.get("data", []) 
-                            if model.get("id", "").startswith("claude")]
-            
-            for model in claude_models:
-                models.append({
-                    "id": model.get("id", ""),
-                    "name": model.get("id", "").replace("-", " ").title(),
-                    "provider": "anthropic"
-                })
-            return {"models": models}
-        else:
-            raise Exception(f"Anthropic API返回错误: {response.status_code}")
-
-def _get_default_models(provider: str):
-    """获取默认模型列表"""
-    default_models = {
-        "aihubmix": [
-            {"id": "gpt-4o-mini", "name": "GPT-4o Mini", "provider": "openai"},
-            {"id": "gpt-4o", "name": "GPT-4o", "provider": "openai"},
-            {"id": "gpt-3.5-turbo", "name": "GPT-3.5 Turbo", "provider": "openai"},
-            {"id": "claude-3-5-sonnet-20241022", "name": "Claude 3.5 Sonnet", "provider": "anthropic"},
-            {"id": "claude-3-5-haiku-20241022", "name": "Claude 3.5 Haiku", "provider": "anthropic"},
-            {"id": "gemini-2.5-flash", "name": "Gemini 2.5 Flash", "provider": "google"},
-            {"id": "gemini-2.5-pro", "name": "Gemini 2.5 Pro", "provider": "google"}
-        ],
-        "openai": [
-            {"id": "gpt-4o-mini", "name": "GPT-4o Mini", "provider": "openai"},
-            {"id": "gpt-4o", "name": "GPT-4o", "provider": "openai"},
-            {"id": "gpt-3.5-turbo", "name": "GPT-3.5 Turbo", "provider": "openai"}
-        ],
-        "google": [
-            {"id": "gemini-2.5-flash", "name": "Gemini 2.5 Flash", "provider": "google"},
-            {"id": "gemini-2.5-pro", "name": "Gemini 2.5 Pro", "provider": "google"},
-            {"id": "gemini-2.5-flash-lite", "name": "Gemini 2.5 Flash Lite", "provider": "google"}
-        ],
-        "anthropic": [
-            {"id": "claude-3-5-sonnet-20241022", "name": "Claude 3.5 Sonnet", "provider": "anthropic"},
-            {"id": "claude-3-5-haiku-20241022", "name": "Claude 3.5 Haiku", "provider": "anthropic"},
-            {"id": "claude-3-opus-20240229", "name": "Claude 3 Opus", "provider": "anthropic"}
+    client = app.state.ai_client
+    response = await _send_with_retry(
+        client, "GET",
+        "https://api.anthropic.com/v1/models",
+        headers={
+            "x-api-key": anthropic_api_key,
+            "Content-Type": "application/json",
+            "anthropic-version": "2023-06-01"
+        },
+        timeout=15.0
+    )
+    
+    if response.status_code == 200:
+        data = orjson.loads(response.content)
+        # Anthropic模型过滤，只包含Claude模型
+        models = [
+            {
+                "id": model["id"],
+                "name": model["id"].replace("-", " ").title(),
+                "provider": "anthropic"
+            }
+            for model in data.get("data", [])
+            if model.get("id", "").startswith("claude")
         ]
-    }
-    return default_models.get(provider, default_models["aihubmix"])
+        return {"models": models}
+    else:
+        raise Exception(f"Anthropic API返回错误: {response.status_code}")
+
+# 各提供商的默认模型列表（上游获取失败时使用）
+_DEFAULT_MODELS = {
+    "aihubmix": [
+        {"id": "gpt-4o-mini", "name": "GPT-4o Mini", "provider": "openai"},
+        {"id": "gpt-4o", "name": "GPT-4o", "provider": "openai"},
+        {"id": "gpt-3.5-turbo", "name": "GPT-3.5 Turbo", "provider": "openai"},
+        {"id": "claude-3-5-sonnet-20241022", "name": "Claude 3.5 Sonnet", "provider": "anthropic"},
+        {"id": "claude-3-5-haiku-20241022", "name": "Claude 3.5 Haiku", "provider": "anthropic"},
+        {"id": "gemini-2.5-flash", "name": "Gemini 2.5 Flash", "provider": "google"},
+        {"id": "gemini-2.5-pro", "name": "Gemini 2.5 Pro", "provider": "google"}
+    ],
+    "openai": [
+        {"id": "gpt-4o-mini", "name": "GPT-4o Mini", "provider": "openai"},
+        {"id": "gpt-4o", "name": "GPT-4o", "provider": "openai"},
+        {"id": "gpt-3.5-turbo", "name": "GPT-3.5 Turbo", "provider": "openai"}
+    ],
+    "google": [
+        {"id": "gemini-2.5-flash", "name": "Gemini 2.5 Flash", "provider": "google"},
+        {"id": "gemini-2.5-pro", "name": "Gemini 2.5 Pro", "provider": "google"},
+        {"id": "gemini-2.5-flash-lite", "name": "Gemini 2.5 Flash Lite", "provider": "google"}
+    ],
+    "anthropic": [
+        {"id": "claude-3-5-sonnet-20241022", "name": "Claude 3.5 Sonnet", "provider": "anthropic"},
+        {"id": "claude-3-5-haiku-20241022", "name": "Claude 3.5 Haiku", "provider": "anthropic"},
+        {"id": "claude-3-opus-20240229", "name": "Claude 3 Opus", "provider": "anthropic"}
+    ]
+}
+
+# 各提供商默认模型列表的响应体，启动时序列化一次
+_DEFAULT_MODELS_RESPONSES = {
+    provider: orjson.dumps({"models": models}) for provider, models in _DEFAULT_MODELS.items()
+}
+
+def _default_models_response(provider: str) -> Response:
+    """返回预先序列化好的默认模型列表响应"""
+    content = _DEFAULT_MODELS_RESPONSES.get(provider, _DEFAULT_MODELS_RESPONSES["aihubmix"])
+    return Response(content=content, media_type="application/json")
 
 def get_default_models():
     """返回默认的模型列表"""
@@ -321,42 +530,35 @@ def get_default_models():
         "message": "使用默认模型列表"
     }
 
+# 密钥验证的响应内容固定，启动时序列化一次
+_VALIDATE_KEY_RESPONSE = orjson.dumps({
+    "valid": True,
+    "provider": "aihubmix",
+    "model": "gpt-4o-mini",
+    "message": "API密钥验证成功"
+})
+
 @app.post("/api/validate-key")
 async def validate_api_key(request: dict):
     """验证API密钥的端点"""
-    # 掩码API密钥用于日志记录
-    masked_api_key = mask_api_key(request.get("api_key", ""))
-    print(f"API密钥验证请求: {masked_api_key}")
+    if logger.isEnabledFor(logging.DEBUG):
+        # 掩码API密钥用于日志记录
+        logger.debug("API密钥验证请求: %s", mask_api_key(request.get("api_key", "")))
     
-    return {
-        "valid": True,
-        "provider": "aihubmix",
-        "model": "gpt-4o-mini",
-        "message": "API密钥验证成功"
-    }
+    return Response(content=_VALIDATE_KEY_RESPONSE, media_type="application/json")
 
 
 
-class AIService:
-    def __init__(self):
-        self.openai_api_key = os.getenv("OPENAI_API_KEY")
-        self.aihubmix_api_key = os.getenv("AIHUBMIX_API_KEY")
-        self.google_api_key = os.getenv("GOOGLE_API_KEY")
-        self.anthropic_api_key = os.getenv("ANTHROPIC_API_KEY")
-    
-    async def natural_language_to_scryfall(self, query: str, language: str = "zh", api_key: str = None, provider: str = "aihubmix", model: str = None) -> tuple[str, str]:
-        """将自然语言转换为Scryfall查询语法"""
-        
-        # 预处理用户输入
-        processed_query = preprocess_mtg_query(query, language)
-        print(f"原始查询: {query}")
-        print(f"预处理后: {processed_query}")
-        
-        # 中文提示词模板 - 基于Scryfall官方语法和MTG俚语
-        zh_prompt = f"""
-你是一个万智牌专家，请将用户的中文描述转换为Scryfall搜索语法。
+# 备用映射中匹配数值（法力值/力量/防御力阈值）
+_NUMBER_RE = re.compile(r"\d+")
+
+# 备用映射的中文颜色词表（按原有检测顺序）
+# "绿色"等双字词都包含单字"绿"，只检查单字即可，不必每次构建候选列表
+_ZH_COLOR_WORDS = (("绿", "g"), ("蓝", "u"), ("红", "r"), ("黑", "b"), ("白", "w"))
 
-用户输入：{processed_query}
+# 中文系统提示词 - 基于Scryfall官方语法和MTG俚语
+# 静态内容，每次调用完全相同，便于提供商做前缀缓存；用户输入单独放在user消息
+_ZH_SYSTEM = """你是一个万智牌专家，请将用户的中文描述转换为Scryfall搜索语法。
 
 请返回有效的Scryfall搜索语法，格式要求：
 1. 只返回搜索语法，不要其他解释
@@ -384,7 +586,7 @@ Scryfall官方搜索语法参考：
 法力值：
 - mv<=3 (法力值小于等于3) mv>=5 (法力值大于等于5)
 - mv:even(偶数法力值) mv:odd(奇数法力值)
-- m:{{G}}{{U}} (具体法力符号) m:2WW (简写法力符号)
+- m:{G}{U} (具体法力符号) m:2WW (简写法力符号)
 
 力量/防御力/忠诚度：
 - pow>=4 (力量大于等于4) tou<=2 (防御力小于等于2)
@@ -441,14 +643,10 @@ Scryfall官方搜索语法参考：
 - "神话稀有度" → r:mythic
 - "艾斯波控制" → ci=esper is:spell
 - "2/2熊" → is:bear
-- "清场法术" → (o:"destroy all" OR o:"exile all") t:sorcery
-"""
+- "清场法术" → (o:"destroy all" OR o:"exile all") t:sorcery"""
 
-        # 英文提示词模板 - 基于Scryfall官方语法和MTG俚语
-        en_prompt = f"""
-You are a Magic: The Gathering expert. Convert the user's description to Scryfall search syntax.
-
-User input: {processed_query}
+# 英文系统提示词 - 基于Scryfall官方语法和MTG俚语
+_EN_SYSTEM = """You are a Magic: The Gathering expert. Convert the user's description to Scryfall search syntax.
 
 Return only the valid Scryfall search syntax without any explanation.
 
@@ -474,7 +672,7 @@ Oracle Text:
 Mana Value:
 - mv<=3 (mana value 3 or less) mv>=5 (mana value 5 or more)
 - mv:even mv:odd
-- m:{{G}}{{U}} (specific mana symbols) m:2WW (shorthand mana symbols)
+- m:{G}{U} (specific mana symbols) m:2WW (shorthand mana symbols)
 
 Power/Toughness/Loyalty:
 - pow>=4 (power 4 or more) tou<=2 (toughness 2 or less)
@@ -532,85 +730,148 @@ Examples:
 - "mythic rarity" → r:mythic
 - "esper control" → ci=esper is:spell
 - "2/2 bears" → is:bear
-- "board wipes" → (o:"destroy all" OR o:"exile all") t:sorcery
-"""
+- "board wipes" → (o:"destroy all" OR o:"exile all") t:sorcery"""
+
+# 生成参数：Scryfall语法通常不到30个token，遇到空行即停止，温度为0保证输出确定
+# Anthropic不接受纯空白的停止序列，只靠max_tokens截断
+_AI_MAX_TOKENS = 48
+_AI_STOP_SEQUENCES = ["\n\n"]
+
+# 语言 → (系统提示词, 用户消息模板)，非中文一律使用英文提示词
+_LANGUAGE_PROMPTS = {
+    "zh": (_ZH_SYSTEM, "用户输入：{}"),
+    "en": (_EN_SYSTEM, "User input: {}")
+}
+
+# OpenAI兼容的聊天接口：只有地址、默认模型和超时不同
+_OPENAI_COMPATIBLE_PROVIDERS = {
+    "aihubmix": {
+        "name": "AIHubMix",
+        "url": "https://aihubmix.com/v1/chat/completions",
+        "default_model": "gpt-4o-mini",
+        "timeout": 20.0
+    },
+    "openai": {
+        "name": "OpenAI",
+        "url": "https://api.openai.com/v1/chat/completions",
+        "default_model": "gpt-4o-mini",
+        "timeout": 30.0
+    }
+}
+
+# 自然语言 → Scryfall语法的翻译缓存：常见查询反复出现，命中时无需调用AI
+# （调用使用temperature=0，同一输入的输出基本确定，可以安全缓存）
+_TRANSLATION_CACHE_TTL = 86400
+_translation_cache = TTLCache(maxsize=10000, ttl=_TRANSLATION_CACHE_TTL)
+# 正在进行中的翻译任务：相同查询并发到达时共享同一个上游调用
+_translation_inflight = {}
+
+def _api_key_fingerprint(api_key: Optional[str]) -> str:
+    """用户API密钥的指纹（sha256前16位）：不同密钥的结果分开缓存，内存中不保存密钥本身"""
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16] if api_key else ""
+
+def _translation_cache_key(query: str, language: str, provider: str, model: Optional[str], api_key: Optional[str] = None) -> str:
+    """翻译缓存键：语言、模型、提供商、用户密钥指纹和归一化后的查询（小写，连续空白合并为一个空格）
+
+    用户自带密钥的翻译按密钥分开缓存和单飞，一个无效密钥的失败结果不会被其他用户共享。
+    """
+    normalized = " ".join(query.lower().split())
+    fingerprint = _api_key_fingerprint(api_key)
+    return hashlib.sha256(f"{language}|{model}|{provider}|{fingerprint}|{normalized}".encode('utf-8')).hexdigest()
 
-        prompt = zh_prompt if language == "zh" else en_prompt
+class AIService:
+    def __init__(self, client: Optional[httpx.AsyncClient] = None):
+        # 共享的httpx客户端，由应用lifespan注入
+        self.client = client
+        self.openai_api_key = os.getenv("OPENAI_API_KEY")
+        self.aihubmix_api_key = os.getenv("AIHUBMIX_API_KEY")
+        self.google_api_key = os.getenv("GOOGLE_API_KEY")
+        self.anthropic_api_key = os.getenv("ANTHROPIC_API_KEY")
+    
+    def is_translation_cached(self, query: str, language: str, api_key: Optional[str], provider: str, model: Optional[str]) -> bool:
+        """翻译结果是否已在缓存中（不发起任何调用）"""
+        processed_query = preprocess_mtg_query(query, language)
+        return _translation_cache_key(processed_query, language, provider, model, api_key) in _translation_cache
+    
+    async def natural_language_to_scryfall(self, query: str, language: str = "zh", api_key: str = None, provider: str = "aihubmix", model: str = None) -> tuple[str, str]:
+        """将自然语言转换为Scryfall查询语法（AI翻译结果会被缓存）"""
+        # AI只看到预处理后的查询，按预处理结果缓存："过牌"、"抽卡"等同义说法共用同一条缓存
+        processed_query = preprocess_mtg_query(query, language)
+        cache_key = _translation_cache_key(processed_query, language, provider, model, api_key)
+        cached = _translation_cache.get(cache_key)
+        if cached is not None:
+            logger.debug("翻译缓存命中: %s", query)
+            return cached
+        
+        # 单飞：同一查询只发起一次上游调用，其余请求等待同一个任务
+        # 任务独立于发起请求运行，发起方超时被取消时不影响其他等待者，结果仍会写入缓存
+        task = _translation_inflight.get(cache_key)
+        if task is None:
+            task = asyncio.ensure_future(self._translate_and_cache(cache_key, query, processed_query, language, api_key, provider, model))
+            _translation_inflight[cache_key] = task
+            task.add_done_callback(lambda _: _translation_inflight.pop(cache_key, None))
+        return await asyncio.shield(task)
+    
+    async def _translate_and_cache(self, cache_key: str, query: str, processed_query: str, language: str, api_key: Optional[str], provider: str, model: Optional[str]) -> tuple[str, str]:
+        """翻译查询并写入缓存"""
+        result = await self._translate_query(query, processed_query, language, api_key, provider, model)
+        # 本地映射的结果不缓存，AI恢复后可以重新得到更好的翻译
+        if result[1] != "fallback":
+            _translation_cache[cache_key] = result
+        return result
+    
+    async def _translate_query(self, query: str, processed_query: str, language: str, api_key: Optional[str], provider: str, model: Optional[str]) -> tuple[str, str]:
+        """调用AI将预处理后的查询转换为Scryfall查询语法，全部失败时对原始查询使用本地映射"""
+        logger.debug("原始查询: %s，预处理后: %s", query, processed_query)
+        
+        system_prompt, prompt_template = _LANGUAGE_PROMPTS.get(language, _LANGUAGE_PROMPTS["en"])
+        prompt = prompt_template.format(processed_query)
 
         # 如果提供了API密钥，优先使用
         if api_key:
             try:
-                return await self._call_ai_api(prompt, api_key, provider, model), provider
+                return await self._call_ai_api(system_prompt, prompt, api_key, provider, model), provider
             except Exception as e:
-                print(f"API调用失败: {e}")
+                logger.warning("API调用失败: %s", e)
                 return self.fallback_mapping(query, language), "fallback"
 
         # 优先使用Aihubmix API
         if self.aihubmix_api_key:
             try:
-                return await self._call_ai_api(prompt, self.aihubmix_api_key, "aihubmix", model), "aihubmix"
+                return await self._call_ai_api(system_prompt, prompt, self.aihubmix_api_key, "aihubmix", model), "aihubmix"
             except Exception as e:
-                print(f"Aihubmix API error: {e}")
+                logger.warning("Aihubmix API error: %s", e)
 
         # 使用OpenAI API
         if self.openai_api_key:
             try:
-                return await self._call_ai_api(prompt, self.openai_api_key, "openai", model), "openai"
+                return await self._call_ai_api(system_prompt, prompt, self.openai_api_key, "openai", model), "openai"
             except Exception as e:
-                print(f"OpenAI API error: {e}")
+                logger.warning("OpenAI API error: %s", e)
 
         # 如果都失败，使用本地关键词映射
         return self.fallback_mapping(query, language), "fallback"
 
-    async def _call_ai_api(self, prompt: str, api_key: str, provider: str, model: str = None) -> str:
-        """调用AI API"""
-        if provider == "aihubmix":
-            return await self._call_aihubmix_api(prompt, api_key, model)
-        elif provider == "openai":
-            return await self._call_openai_api(prompt, api_key, model)
+    async def _call_ai_api(self, system_prompt: str, prompt: str, api_key: str, provider: str, model: str = None) -> str:
+        """调用AI API（system_prompt为静态提示词，prompt为用户输入）"""
+        if provider in _OPENAI_COMPATIBLE_PROVIDERS:
+            return await self._call_openai_compatible_api(provider, system_prompt, prompt, api_key, model)
         elif provider == "google":
-            return await self._call_google_api(prompt, api_key, model)
+            return await self._call_google_api(system_prompt, prompt, api_key, model)
         elif provider == "anthropic":
-            return await self._call_anthropic_api(prompt, api_key, model)
+            return await self._call_anthropic_api(system_prompt, prompt, api_key, model)
         else:
             raise Exception(f"不支持的API提供商: {provider}")
 
-    async def _call_aihubmix_api(self, prompt: str, api_key: str, model: str = None) -> str:
-        """调用AIHubMix API"""
-        client = httpx.AsyncClient()
-        model = model or "gpt-4o-mini"
-        
-        response = await client.post(
-            "https://aihubmix.com/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": model,
-                "messages": [
-                    {"role": "system", "content": "You are a Magic: The Gathering expert."},
-                    {"role": "user", "content": prompt}
-                ],
-                "max_tokens": 100,
-                "temperature": 0.1
-            },
-            timeout=20.0
-        )
-        
-        if response.status_code == 200:
-            data = response.json()
-            return data["choices"][0]["message"]["content"].strip()
-        else:
-            raise Exception(f"AIHubMix API调用失败: {response.status_code}")
-
-    async def _call_openai_api(self, prompt: str, api_key: str, model: str = None) -> str:
-        """调用OpenAI API"""
-        client = httpx.AsyncClient()
-        model = model or "gpt-4o-mini"
+    async def _call_openai_compatible_api(self, provider: str, system_prompt: str, prompt: str, api_key: str, model: str = None) -> str:
+        """调用OpenAI兼容的聊天接口（AIHubMix / OpenAI）"""
+        config = _OPENAI_COMPATIBLE_PROVIDERS[provider]
+        client = self.client
+        model = model or config["default_model"]
         
-        response = await client.post(
-            "https://api.openai.com/v1/chat/completions",
+        response = await _send_with_retry(
+            client, "POST",
+            config["url"],
             headers={
                 "Authorization": f"Bearer {api_key}",
                 "Content-Type": "application/json"
@@ -618,53 +879,63 @@ Examples:
             json={
                 "model": model,
                 "messages": [
-                    {"role": "system", "content": "You are a Magic: The Gathering expert."},
+                    {"role": "system", "content": system_prompt},
                     {"role": "user", "content": prompt}
                 ],
-                "max_tokens": 100,
-                "temperature": 0.1
+                "max_tokens": _AI_MAX_TOKENS,
+                "temperature": 0,
+                "stop": _AI_STOP_SEQUENCES
             },
-            timeout=30.0
+            timeout=config["timeout"]
         )
         
         if response.status_code == 200:
-            data = response.json()
+            data = orjson.loads(response.content)
             return data["choices"][0]["message"]["content"].strip()
         else:
-            raise Exception(f"OpenAI API调用失败: {response.status_code}")
+            raise Exception(f"{config['name']} API调用失败: {response.status_code}")
 
-    async def _call_google_api(self, prompt: str, api_key: str, model: str = None) -> str:
+    async def _call_google_api(self, system_prompt: str, prompt: str, api_key: str, model: str = None) -> str:
         """调用Google Gemini API"""
-        client = httpx.AsyncClient()
+        client = self.client
         model = model or "gemini-2.5-flash"
         
         # 根据Google Gemini API文档构建请求
-        response = await client.post(
+        response = await _send_with_retry(
+            client, "POST",
             f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent",
             headers={
                 "x-goog-api-key": api_key,
                 "Content-Type": "application/json"
             },
             json={
+                "systemInstruction": {
+                    "parts": [
+                        {
+                            "text": system_prompt
+                        }
+                    ]
+                },
                 "contents": [
                     {
                         "parts": [
                             {
-                                "text": f"You are a Magic: The Gathering expert. {prompt}"
+                                "text": prompt
                             }
                         ]
                     }
                 ],
                 "generationConfig": {
                     "maxOutputTokens": 100,
-                    "temperature": 0.1
+                    "temperature": 0,
+                    "stopSequences": _AI_STOP_SEQUENCES
                 }
             },
             timeout=30.0
         )
         
         if response.status_code == 200:
-            data = response.json()
+            data = orjson.loads(response.content)
             # Google API返回格式不同
             if "candidates" in data and len(data["candidates"]) > 0:
                 return data["candidates"][0]["content"]["parts"][0]["text"].strip()
@@ -673,12 +944,13 @@ Examples:
         else:
             raise Exception(f"Google API调用失败: {response.status_code}")
 
-    async def _call_anthropic_api(self, prompt: str, api_key: str, model: str = None) -> str:
+    async def _call_anthropic_api(self, system_prompt: str, prompt: str, api_key: str, model: str = None) -> str:
         """调用Anthropic Claude API"""
-        client = httpx.AsyncClient()
+        client = self.client
         model = model or "claude-3-5-sonnet-20241022"
         
-        response = await client.post(
+        response = await _send_with_retry(
+            client, "POST",
             "https://api.anthropic.com/v1/messages",
             headers={
                 "x-api-key": api_key,
@@ -687,11 +959,20 @@ Examples:
             },
             json={
                 "model": model,
-                "max_tokens": 100,
+                "max_tokens": _AI_MAX_TOKENS,
+                "temperature": 0,
+                # 静态提示词标记为可缓存，重复调用只按缓存价格计费
+                "system": [
+                    {
+                        "type": "text",
+                        "text": system_prompt,
+                        "cache_control": {"type": "ephemeral"}
+                    }
+                ],
                 "messages": [
                     {
                         "role": "user",
-                        "content": f"You are a Magic: The Gathering expert. {prompt}"
+                        "content": prompt
                     }
                 ]
             },
@@ -699,30 +980,27 @@ Examples:
         )
         
         if response.status_code == 200:
-            data = response.json()
+            data = orjson.loads(response.content)
             return data["content"][0]["text"].strip()
         else:
             raise Exception(f"Anthropic API调用失败: {response.status_code}")
 
-    def fallback_mapping(self, query: str, language: str) -> str:
-        """增强的关键词映射作为备用方案 - 基于Scryfall官方语法"""
+    @staticmethod
+    @functools.lru_cache(maxsize=2048)
+    def fallback_mapping(query: str, language: str) -> str:
+        """增强的关键词映射作为备用方案 - 基于Scryfall官方语法
+
+        结果只取决于查询和语言，示例和热门查询直接命中缓存。
+        """
         query_lower = query.lower()
+        # 数字按完整数值匹配，避免"2024"中的"4"、"13"中的"3"被误识别为阈值
+        numbers = set(_NUMBER_RE.findall(query_lower))
         conditions = []
 
         # 中文关键词映射
         if language == "zh":
             # 智能颜色映射 - 检测颜色组合
-            colors_found = []
-            if any(color in query_lower for color in ["绿色", "绿"]):
-                colors_found.append("g")
-            if any(color in query_lower for color in ["蓝色", "蓝"]):
-                colors_found.append("u")
-            if any(color in query_lower for color in ["红色", "红"]):
-                colors_found.append("r")
-            if any(color in query_lower for color in ["黑色", "黑"]):
-                colors_found.append("b")
-            if any(color in query_lower for color in ["白色", "白"]):
-                colors_found.append("w")
+            colors_found = [color for word, color in _ZH_COLOR_WORDS if word in query_lower]
             
             # 处理颜色组合
             if len(colors_found) > 1:
@@ -828,34 +1106,34 @@ Examples:
             # 法力值
             if "法力值" in query_lower or "费用" in query_lower:
                 if "小于" in query_lower or "以下" in query_lower:
-                    if "3" in query_lower:
+                    if "3" in numbers:
                         conditions.append("mv<=3")
-                    elif "2" in query_lower:
+                    elif "2" in numbers:
                         conditions.append("mv<=2")
-                    elif "1" in query_lower:
+                    elif "1" in numbers:
                         conditions.append("mv<=1")
                 elif "大于" in query_lower or "以上" in query_lower:
-                    if "5" in query_lower:
+                    if "5" in numbers:
                         conditions.append("mv>=5")
-                    elif "4" in query_lower:
+                    elif "4" in numbers:
                         conditions.append("mv>=4")
-                    elif "6" in query_lower:
+                    elif "6" in numbers:
                         conditions.append("mv>=6")
 
             # 力量/防御力
             if "力量" in query_lower:
                 if "大于" in query_lower or "以上" in query_lower:
-                    if "4" in query_lower:
+                    if "4" in numbers:
                         conditions.append("pow>=4")
-                    elif "5" in query_lower:
+                    elif "5" in numbers:
                         conditions.append("pow>=5")
-                    elif "6" in query_lower:
+                    elif "6" in numbers:
                         conditions.append("pow>=6")
             if "防御力" in query_lower:
                 if "小于" in query_lower or "以下" in query_lower:
-                    if "2" in query_lower:
+                    if "2" in numbers:
                         conditions.append("tou<=2")
-                    elif "3" in query_lower:
+                    elif "3" in numbers:
                         conditions.append("tou<=3")
 
             # 特殊关键词
@@ -1019,34 +1297,34 @@ Examples:
             # 法力值
             if "mana" in query_lower or "cost" in query_lower:
                 if "under" in query_lower or "less" in query_lower:
-                    if "3" in query_lower:
+                    if "3" in numbers:
                         conditions.append("mv<=3")
-                    elif "2" in query_lower:
+                    elif "2" in numbers:
                         conditions.append("mv<=2")
-                    elif "1" in query_lower:
+                    elif "1" in numbers:
                         conditions.append("mv<=1")
                 elif "over" in query_lower or "more" in query_lower:
-                    if "5" in query_lower:
+                    if "5" in numbers:
                         conditions.append("mv>=5")
-                    elif "4" in query_lower:
+                    elif "4" in numbers:
                         conditions.append("mv>=4")
-                    elif "6" in query_lower:
+                    elif "6" in numbers:
                         conditions.append("mv>=6")
 
             # 力量/防御力
             if "power" in query_lower:
                 if "over" in query_lower or "more" in query_lower:
-                    if "4" in query_lower:
+                    if "4" in numbers:
                         conditions.append("pow>=4")
-                    elif "5" in query_lower:
+                    elif "5" in numbers:
                         conditions.append("pow>=5")
-                    elif "6" in query_lower:
+                    elif "6" in numbers:
                         conditions.append("pow>=6")
             if "toughness" in query_lower:
                 if "under" in query_lower or "less" in query_lower:
-                    if "2" in query_lower:
+                    if "2" in numbers:
                         conditions.append("tou<=2")
-                    elif "3" in query_lower:
+                    elif "3" in numbers:
                         conditions.append("tou<=3")
 
             # 特殊关键词
@@ -1103,16 +1381,126 @@ Examples:
             if "staple" in query_lower:
                 conditions.append("(o:\"draw\" OR o:\"destroy\" OR o:\"counter\")")
 
-        # 组合所有条件
+        # 组合所有条件（不同关键词可能映射到同一条件，如"快攻"和"法力值3以下"都产生mv<=3，
+        # 按首次出现的顺序去重）
         if conditions:
-            return " ".join(conditions)
+            return " ".join(dict.fromkeys(conditions))
         
         # 如果没有匹配到任何条件，直接返回原始查询
         # 这样可以让Scryfall进行模糊搜索
         return query
 
+# Scryfall搜索结果缓存：卡牌数据变化很慢，15分钟内相同查询直接复用
+# 单条结果可能包含上千张卡牌（每张约1.8KB），按卡牌总数而不是条目数限制大小：
+# 每个worker最多缓存约2万张（约36MB），超过5000张的宽泛查询（如t:creature）不缓存
+_SCRYFALL_CACHE_TTL = 900
+_SCRYFALL_CACHE_MAX_CARDS = 20000
+_SCRYFALL_CACHE_MAX_RESULT_CARDS = 5000
+_scryfall_cache = TTLCache(
+    maxsize=_SCRYFALL_CACHE_MAX_CARDS, ttl=_SCRYFALL_CACHE_TTL,
+    getsizeof=lambda result: max(1, len(result["data"]))
+)
+# 正在进行中的Scryfall查询
+_scryfall_inflight = {}
+# 缓存中只保留响应模型和排序用到的字段，不保存完整的Scryfall卡牌数据
+_SCRYFALL_CARD_FIELDS = (
+    "name", "mana_cost", "type_line", "oracle_text", "image_uris", "scryfall_uri", "rarity",
+    "set", "released_at", "color_identity", "cmc", "power", "toughness", "artist"
+)
+
+# 本地数据无法计算、交给Scryfall服务端排序（order=/dir=参数）的排序方式
+_SCRYFALL_SERVER_ORDERS = frozenset({"edhrec"})
+
+# 排序用的数值映射，模块加载时构建一次，不在每张卡牌的key函数里重复创建
+_COLOR_SORT_VALUES = {'W': 1, 'U': 2, 'B': 3, 'R': 4, 'G': 5}
+_RARITY_SORT_VALUES = {
+    'mythic': 4,
+    'rare': 3,
+    'uncommon': 2,
+    'common': 1
+}
+
+@functools.lru_cache(maxsize=256)
+def _stat_sort_value(value) -> int:
+    """力量/防御力的排序值：整数（可带正负号）直接转换，*、1+*、X等非数字值按0处理
+
+    先用isdecimal判断，常见的非数字值不再走异常处理。
+    不同取值只有几十种，缓存后每张牌只剩一次字典查找。
+    """
+    if not isinstance(value, str):
+        return 0
+    digits = value[1:] if value[:1] in ("+", "-") else value
+    return int(value) if digits.isdecimal() else 0
+
+def _power_sort_key(card: dict) -> int:
+    """力量字段，需要转换为数字进行排序"""
+    return _stat_sort_value(card.get('power', '0'))
+
+def _toughness_sort_key(card: dict) -> int:
+    """防御力字段"""
+    return _stat_sort_value(card.get('toughness', '0'))
+
+def _cmc_sort_key(card: dict) -> float:
+    """法力值字段"""
+    cmc = card.get('cmc', 0)
+    if cmc is None:
+        return 0
+    return float(cmc)
+
+def _released_sort_key(card: dict) -> str:
+    """发布日期字段"""
+    return card.get('released_at', '')
+
+def _color_sort_key(card: dict) -> int:
+    """颜色身份字段：无色=0, 单色=1-5, 多色=6+"""
+    color_identity = card.get('color_identity', [])
+    if not color_identity:
+        return 0  # 无色
+    elif len(color_identity) == 1:
+        # 单色：W=1, U=2, B=3, R=4, G=5
+        return _COLOR_SORT_VALUES.get(color_identity[0], 0)
+    else:
+        # 多色：按颜色数量排序，数量相同时按字母顺序
+        return 6 + len(color_identity)
+
+def _rarity_sort_key(card: dict) -> int:
+    """稀有度字段，转换为数值排序
+
+    升序为从低到高（common → uncommon → rare → mythic），降序为从高到低，直接使用reverse参数即可。
+    """
+    rarity = card.get('rarity', '').lower()
+    return _RARITY_SORT_VALUES.get(rarity, 0)
+
+# 请求中的排序方式 → 卡牌字段
+_SORT_FIELDS = {
+    "name": "name",
+    "set": "set",
+    "released": "released_at",
+    "rarity": "rarity",
+    "color": "color_identity",
+    "cmc": "cmc",
+    "power": "power",
+    "toughness": "toughness",
+    "artist": "artist"
+}
+
+# 需要特殊处理的字段 → key函数
+_SORT_KEYS = {
+    "power": _power_sort_key,
+    "toughness": _toughness_sort_key,
+    "cmc": _cmc_sort_key,
+    "released_at": _released_sort_key,
+    "color_identity": _color_sort_key,
+    "rarity": _rarity_sort_key
+}
+
 class ScryfallService:
-    def __init__(self):
+    def __init__(self, client: Optional[httpx.AsyncClient] = None):
+        # 共享的httpx客户端（base_url和请求头已配置好），由应用lifespan注入
+        self.client = client
+        # 最近一次访问Scryfall的时间，用于判断连接池中是否还有可复用的连接
+        self._last_request = float("-inf")
+        self._prewarm_task: Optional[asyncio.Task] = None
         self.base_url = "https://api.scryfall.com"
         # 根据Scryfall API要求设置必要的请求头
         self.headers = {
@@ -1123,189 +1511,178 @@ class ScryfallService:
     async def search_cards(self, query: str, page: int = 1, sort: str = "name", order: str = "asc") -> dict:
         """搜索卡牌 - 自动获取所有结果"""
         try:
-            print(f"开始搜索: {query}")
-            
-            # 首先获取第一页来确定总数
-            first_page_result = await self._fetch_page(query, 1)
-            total_cards = first_page_result.get('total_cards', 0)
-            
-            if total_cards == 0:
-                return {"data": [], "total_cards": 0}
-            
-            print(f"总共找到 {total_cards} 张卡牌")
+            logger.debug("开始搜索: %s", query)
             
-            # 计算需要获取的页数
-            cards_per_page = 175  # Scryfall每页固定175张
-            total_pages = (total_cards + cards_per_page - 1) // cards_per_page
+            # 本地可排序的结果与排序方式无关，按查询缓存；服务端排序的结果按查询+排序缓存
+            server_order = sort in _SCRYFALL_SERVER_ORDERS
+            direction = "desc" if order == "desc" else "asc"
+            cache_key = f"{query}|order={sort}|dir={direction}" if server_order else query
             
-            print(f"需要获取 {total_pages} 页数据")
-            
-            # 获取所有页的数据
-            all_cards = []
-            for page_num in range(1, total_pages + 1):
-                print(f"正在获取第 {page_num}/{total_pages} 页...")
-                page_result = await self._fetch_page(query, page_num)
-                if page_result.get('data'):
-                    all_cards.extend(page_result['data'])
-                
-                # 添加小延迟避免请求过快
-                if page_num < total_pages:
-                    import asyncio
-                    await asyncio.sleep(0.1)
+            result = _scryfall_cache.get(cache_key)
+            if result is not None:
+                logger.debug("Scryfall缓存命中: %s", cache_key)
+            else:
+                # 单飞：相同查询并发到达时只向Scryfall拉取一次
+                task = _scryfall_inflight.get(cache_key)
+                if task is None:
+                    if server_order:
+                        fetch = self._fetch_all_cards(query, cache_key, {"order": sort, "dir": direction})
+                    else:
+                        fetch = self._fetch_all_cards(query, cache_key)
+                    task = asyncio.ensure_future(fetch)
+                    _scryfall_inflight[cache_key] = task
+                    task.add_done_callback(lambda _: _scryfall_inflight.pop(cache_key, None))
+                result = await asyncio.shield(task)
             
-            print(f"成功获取 {len(all_cards)} 张卡牌")
+            all_cards = result["data"]
+            total_cards = result["total_cards"]
+            # complete为False表示Scryfall请求失败或结果不完整，调用方不应缓存
+            complete = result["complete"]
+            if total_cards == 0:
+                return {"data": [], "total_cards": 0, "complete": complete}
             
-            # 对所有卡牌进行排序
-            if all_cards:
+            # 对所有卡牌进行排序（返回新列表，不会修改缓存中的数据）
+            if server_order:
+                # Scryfall已按要求的顺序返回
+                sorted_cards = list(all_cards)
+            elif all_cards:
                 sorted_cards = await self.sort_cards(all_cards, sort, order)
             else:
                 sorted_cards = []
             
             return {
                 "data": sorted_cards,
-                "total_cards": total_cards
+                "total_cards": total_cards,
+                "complete": complete
             }
 
         except Exception as e:
-            print(f"Scryfall API error: {e}")
+            logger.warning("Scryfall API error: %s", e)
             raise HTTPException(status_code=500, detail="Failed to search cards")
 
-    async def _fetch_page(self, query: str, page: int) -> dict:
-        """获取单页数据"""
+    async def _fetch_all_cards(self, query: str, cache_key: str, order_params: Optional[dict] = None) -> dict:
+        """获取查询的所有页，只保留下游用到的字段，完整获取时写入缓存
+
+        order_params为Scryfall的order/dir参数，不传时使用Scryfall默认顺序（之后在本地排序）。
+        """
+        # 首先获取第一页来确定总数
+        first_page_result = await self._fetch_page(query, 1, order_params)
+        if first_page_result.get('failed'):
+            # 请求失败不等于没有结果，不能当作"0张卡牌"缓存
+            return {"data": [], "total_cards": 0, "complete": False}
+        total_cards = first_page_result.get('total_cards', 0)
+        
+        if total_cards == 0:
+            return {"data": [], "total_cards": 0, "complete": True}
+        
+        logger.debug("总共找到 %d 张卡牌", total_cards)
+        
+        # 计算需要获取的页数
+        cards_per_page = 175  # Scryfall每页固定175张
+        total_pages = (total_cards + cards_per_page - 1) // cards_per_page
+        
+        logger.debug("需要获取 %d 页数据", total_pages)
+        
+        # 获取所有页的数据（第一页已经取到，直接复用，不再重复请求）
+        all_cards = []
+        for page_num in range(1, total_pages + 1):
+            logger.debug("正在获取第 %d/%d 页...", page_num, total_pages)
+            if page_num == 1:
+                page_result = first_page_result
+            else:
+                page_result = await self._fetch_page(query, page_num, order_params)
+            if page_result.get('data'):
+                all_cards.extend(
+                    {field: card[field] for field in _SCRYFALL_CARD_FIELDS if field in card}
+                    for card in page_result['data']
+                )
+            
+            # 添加小延迟避免请求过快
+            if page_num < total_pages:
+                await asyncio.sleep(0.1)
+        
+        logger.debug("成功获取 %d 张卡牌", len(all_cards))
+        
+        # 某页获取失败时结果不完整，不缓存，下次请求重新获取
+        complete = len(all_cards) == total_cards
+        result = {"data": all_cards, "total_cards": total_cards, "complete": complete}
+        if complete and len(all_cards) <= _SCRYFALL_CACHE_MAX_RESULT_CARDS:
+            _scryfall_cache[cache_key] = result
+        return result
+
+    async def prewarm(self):
+        """连接空闲超过keep-alive时间（已被关闭）时，预先建立到Scryfall的连接"""
+        if time.monotonic() - self._last_request < _HTTP_KEEPALIVE_EXPIRY:
+            return
+        self._last_request = time.monotonic()
+        try:
+            await self.client.head("/", timeout=5.0)
+        except Exception as e:
+            logger.warning("Scryfall连接预热失败: %s", e)
+
+    def start_prewarm(self) -> None:
+        """在后台预热连接，调用方不等待；已有预热任务在进行时不重复发起"""
+        if self._prewarm_task is None or self._prewarm_task.done():
+            self._prewarm_task = asyncio.create_task(self.prewarm())
+
+    async def _fetch_page(self, query: str, page: int, order_params: Optional[dict] = None) -> dict:
+        """获取单页数据
+
+        404表示查询没有结果，返回空结果；其他错误返回带failed标记的空结果，由调用方区分。
+        """
         try:
             params = {
                 "q": query,
                 "page": page,
                 "unique": "cards"
             }
+            if order_params:
+                params.update(order_params)
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/cards/search",
-                    params=params,
-                    headers=self.headers,
-                    timeout=30.0
-                )
+            client = self.client
+            self._last_request = time.monotonic()
+            response = await _send_with_retry(
+                client, "GET",
+                "/cards/search",
+                params=params,
+                timeout=30.0
+            )
 
-                if response.status_code == 200:
-                    result = response.json()
-                    return result
-                elif response.status_code == 404:
-                    return {"data": [], "total_cards": 0}
-                else:
-                    print(f"Scryfall API 错误: {response.status_code}")
-                    raise HTTPException(status_code=response.status_code, detail="Scryfall API error")
+            if response.status_code == 200:
+                result = orjson.loads(response.content)
+                return result
+            elif response.status_code == 404:
+                return {"data": [], "total_cards": 0}
+            else:
+                logger.warning("Scryfall API 错误: %d", response.status_code)
+                raise HTTPException(status_code=response.status_code, detail="Scryfall API error")
 
         except Exception as e:
-            print(f"获取第 {page} 页时出错: {e}")
-            return {"data": [], "total_cards": 0}
+            logger.warning("获取第 %d 页时出错: %s", page, e)
+            return {"data": [], "total_cards": 0, "failed": True}
 
     async def sort_cards(self, cards: list, sort: str, order: str) -> list:
         """对卡牌列表进行排序"""
         try:
-            # 排序字段映射
-            sort_mapping = {
-                "name": "name",
-                "set": "set",
-                "released": "released",
-                "rarity": "rarity", 
-                "color": "color_identity",
-                "cmc": "cmc",
-                "power": "power",
-                "toughness": "toughness",
-                "artist": "artist"
-            }
-            
-            sort_field = sort_mapping.get(sort, "name")
+            sort_field = _SORT_FIELDS.get(sort, "name")
             reverse = order == "desc"
             
             # 检查字段是否存在
             if cards and sort_field not in cards[0]:
-                print(f"警告: 字段 '{sort_field}' 不存在于卡牌数据中，使用默认排序")
+                logger.warning("字段 '%s' 不存在于卡牌数据中，使用默认排序", sort_field)
                 sort_field = "name"
             
-            # 特殊处理某些字段
-            if sort_field == "power":
-                # 处理力量字段，需要转换为数字进行排序
-                def get_power_value(card):
-                    power = card.get('power', '0')
-                    if power == '*':
-                        return 0  # 通配符力量值设为0
-                    try:
-                        return int(power)
-                    except (ValueError, TypeError):
-                        return 0
-                
-                sorted_cards = sorted(cards, key=get_power_value, reverse=reverse)
-            elif sort_field == "toughness":
-                # 处理防御力字段
-                def get_toughness_value(card):
-                    toughness = card.get('toughness', '0')
-                    if toughness == '*':
-                        return 0
-                    try:
-                        return int(toughness)
-                    except (ValueError, TypeError):
-                        return 0
-                
-                sorted_cards = sorted(cards, key=get_toughness_value, reverse=reverse)
-            elif sort_field == "cmc":
-                # 处理法力值字段
-                def get_cmc_value(card):
-                    cmc = card.get('cmc', 0)
-                    if cmc is None:
-                        return 0
-                    return float(cmc)
-                
-                sorted_cards = sorted(cards, key=get_cmc_value, reverse=reverse)
-            elif sort_field == "released":
-                # 处理发布日期字段
-                def get_released_value(card):
-                    released = card.get('released_at', '')
-                    return released
-                
-                sorted_cards = sorted(cards, key=get_released_value, reverse=reverse)
-            elif sort_field == "color_identity":
-                # 处理颜色身份字段
-                def get_color_value(card):
-                    color_identity = card.get('color_identity', [])
-                    # 将颜色转换为数值进行排序：无色=0, 单色=1-5, 多色=6+
-                    if not color_identity:
-                        return 0  # 无色
-                    elif len(color_identity) == 1:
-                        # 单色：W=1, U=2, B=3, R=4, G=5
-                        color_map = {'W': 1, 'U': 2, 'B': 3, 'R': 4, 'G': 5}
-                        return color_map.get(color_identity[0], 0)
-                    else:
-                        # 多色：按颜色数量排序，数量相同时按字母顺序
-                        return 6 + len(color_identity)
-                
-                sorted_cards = sorted(cards, key=get_color_value, reverse=reverse)
-            elif sort_field == "rarity":
-                # 处理稀有度字段，需要转换为数值进行排序
-                def get_rarity_value(card):
-                    rarity = card.get('rarity', '').lower()
-                    rarity_scores = {
-                        'mythic': 4,
-                        'rare': 3,
-                        'uncommon': 2,
-                        'common': 1
-                    }
-                    return rarity_scores.get(rarity, 0)
-                
-                # 稀有度排序：升序应该是从低到高（common → uncommon → rare → mythic）
-                # 降序应该是从高到低（mythic → rare → uncommon → common）
-                # 所以直接使用reverse参数即可
-                sorted_cards = sorted(cards, key=get_rarity_value, reverse=reverse)
-            else:
-                # 其他字段直接按字符串排序
-                sorted_cards = sorted(cards, key=lambda x: x.get(sort_field, ''), reverse=reverse)
+            # 特殊字段使用预先定义的key函数，其他字段直接按字符串排序
+            key_func = _SORT_KEYS.get(sort_field)
+            if key_func is None:
+                key_func = lambda x: x.get(sort_field, '')
+            sorted_cards = sorted(cards, key=key_func, reverse=reverse)
             
-            print(f"排序完成: {sort_field}:{order}")
+            logger.debug("排序完成: %s:%s", sort_field, order)
             return sorted_cards
             
         except Exception as e:
-            print(f"排序错误: {e}")
+            logger.warning("排序错误: %s", e)
             raise e  # 直接重新抛出原始异常，保持原始错误信息
 
 
@@ -1323,39 +1700,99 @@ def mask_api_key(api_key: str) -> str:
 ai_service = AIService()
 scryfall_service = ScryfallService()
 
-@app.post("/api/search", response_model=SearchResponse)
-async def search_cards(request: SearchRequest):
+# 搜索接口限流：按客户端IP的令牌桶，每分钟20次，允许20次突发（每个worker独立计数）
+_RATE_LIMIT_CAPACITY = 20
+_RATE_LIMIT_REFILL_PER_SECOND = _RATE_LIMIT_CAPACITY / 60.0
+# 空闲60秒的桶已经回满，过期删除即可，不影响结果
+_rate_limit_buckets: TTLCache = TTLCache(maxsize=10000, ttl=60)
+
+# 前面可信反向代理的层数：每层代理都会在X-Forwarded-For末尾追加它看到的对端地址。
+# 客户端可以任意伪造开头的条目，只有从右往左数第N个（由最外层可信代理写入）才可信。
+# Render前面只有一层代理，默认为1；直接对外提供服务时设为0，忽略该请求头
+_TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "1"))
+
+def _client_ip(http_request: Request) -> str:
+    """获取客户端IP：取X-Forwarded-For中由可信代理追加的地址，否则使用连接的对端地址"""
+    forwarded_for = http_request.headers.get("X-Forwarded-For")
+    if forwarded_for and _TRUSTED_PROXY_HOPS > 0:
+        hops = [hop.strip() for hop in forwarded_for.split(",")]
+        if len(hops) >= _TRUSTED_PROXY_HOPS and hops[-_TRUSTED_PROXY_HOPS]:
+            return hops[-_TRUSTED_PROXY_HOPS]
+    return http_request.client.host if http_request.client else "unknown"
+
+def _check_rate_limit(client_key: str) -> None:
+    """消耗一个令牌，令牌不足时直接返回429，不再调用上游"""
+    now = time.monotonic()
+    tokens, updated = _rate_limit_buckets.get(client_key, (_RATE_LIMIT_CAPACITY, now))
+    tokens = min(_RATE_LIMIT_CAPACITY, tokens + (now - updated) * _RATE_LIMIT_REFILL_PER_SECOND)
+    if tokens < 1:
+        _rate_limit_buckets[client_key] = (tokens, now)
+        retry_after = (1 - tokens) / _RATE_LIMIT_REFILL_PER_SECOND
+        raise HTTPException(
+            status_code=429,
+            detail="请求过于频繁，请稍后再试",
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
+    _rate_limit_buckets[client_key] = (tokens - 1, now)
+
+# /api/search的完整响应缓存：热门查询直接返回序列化好的响应体，
+# 跳过排序、格式转换和JSON序列化（翻译和Scryfall结果另有各自的缓存）
+# 同一查询的每种排序/格式/语言组合各占一份响应体（每张卡约1KB），按字节数限制：
+# 每个worker最多32MB，超过2MB的响应体不缓存
+_SEARCH_RESPONSE_CACHE_TTL = 600
+_SEARCH_RESPONSE_CACHE_MAX_BYTES = 32 * 1024 * 1024
+_SEARCH_RESPONSE_MAX_BODY_BYTES = 2 * 1024 * 1024
+_search_response_cache = TTLCache(
+    maxsize=_SEARCH_RESPONSE_CACHE_MAX_BYTES, ttl=_SEARCH_RESPONSE_CACHE_TTL, getsizeof=len
+)
+_search_cache_stats = {"hits": 0, "misses": 0}
+
+def _search_response_cache_key(request: SearchRequest, provider: str) -> tuple:
+    """响应缓存键：归一化后的查询（同翻译缓存）加上所有影响响应内容的参数和用户密钥指纹"""
+    return (
+        " ".join(request.query.lower().split()), request.language, provider, request.model,
+        _api_key_fingerprint(request.api_key), request.sort, request.order, request.compact
+    )
+
+@app.post("/api/search", response_model=None, responses={200: {"model": SearchResponse}})
+async def search_cards(request: SearchRequest, http_request: Request):
     """搜索卡牌的主要API"""
+    _check_rate_limit(_client_ip(http_request))
     try:
-        # 打印接收到的请求参数
-        print(f"收到搜索请求:")
-        print(f"  查询: {request.query}")
-        print(f"  语言: {request.language}")
-        print(f"  排序: {request.sort}")
-        print(f"  顺序: {request.order}")
-        print(f"  API密钥: {'已提供' if request.api_key else '未提供'}")
-        print(f"  模型: {request.model}")
-        print(f"  提供商: {request.provider}")
-        # 掩码API密钥用于日志记录
-        masked_request = request.dict()
-        if masked_request.get('api_key'):
-            masked_request['api_key'] = mask_api_key(masked_request['api_key'])
-        print(f"  完整请求数据: {masked_request}")
+        # 记录接收到的请求参数（仅在DEBUG级别构建日志内容）
+        if logger.isEnabledFor(logging.DEBUG):
+            # 掩码API密钥用于日志记录
+            masked_request = request.model_dump()
+            if masked_request.get('api_key'):
+                masked_request['api_key'] = mask_api_key(masked_request['api_key'])
+            logger.debug("收到搜索请求: %s", masked_request)
+        
+        provider = "aihubmix" if request.api_key else "demo"
+        response_cache_key = _search_response_cache_key(request, provider)
+        cached_body = _search_response_cache.get(response_cache_key)
+        if cached_body is not None:
+            _search_cache_stats["hits"] += 1
+            return Response(content=cached_body, media_type="application/json")
+        _search_cache_stats["misses"] += 1
         
         # 1. 将自然语言转换为Scryfall查询语法（添加超时）
+        # 翻译未命中缓存时要等AI调用，随后多半也要请求Scryfall：在后台预热连接，
+        # 握手和AI调用重叠进行；翻译命中缓存时不预热，请求也从不等待预热
+        if not ai_service.is_translation_cached(request.query, request.language, request.api_key, provider, request.model):
+            scryfall_service.start_prewarm()
         try:
             scryfall_query, api_provider = await asyncio.wait_for(
                 ai_service.natural_language_to_scryfall(
                     request.query,
                     request.language,
                     request.api_key,
-                    "aihubmix" if request.api_key else "demo",
+                    provider,
                     request.model
                 ),
                 timeout=25.0  # 25秒超时
             )
         except asyncio.TimeoutError:
-            print("AI服务调用超时，使用备用方案")
+            logger.warning("AI服务调用超时，使用备用方案")
             # 使用备用关键词映射
             scryfall_query = ai_service.fallback_mapping(request.query, request.language)
             api_provider = "fallback"
@@ -1363,7 +1800,7 @@ async def search_cards(request: SearchRequest):
         if not scryfall_query:
             raise HTTPException(status_code=400, detail="无法解析搜索查询")
 
-        print(f"生成的Scryfall查询: {scryfall_query}")
+        logger.debug("生成的Scryfall查询: %s", scryfall_query)
 
         # 2. 调用Scryfall API搜索卡牌（添加超时）
         try:
@@ -1379,32 +1816,60 @@ async def search_cards(request: SearchRequest):
             raise HTTPException(status_code=408, detail="Scryfall API调用超时")
 
         # 3. 转换响应格式
-        cards = []
-        for card_data in scryfall_result.get("data", []):
-            card = Card(
-                name=card_data.get("name", ""),
-                mana_cost=card_data.get("mana_cost"),
-                type_line=card_data.get("type_line", ""),
-                oracle_text=card_data.get("oracle_text", ""),
-                image_uris=card_data.get("image_uris"),
-                scryfall_uri=card_data.get("scryfall_uri", ""),
-                rarity=card_data.get("rarity", "")
-            )
-            cards.append(card)
-
-        print(f"搜索完成，返回所有 {len(cards)} 张卡牌")
-        return SearchResponse(
-            cards=cards,
-            scryfall_query=scryfall_query,
-            total_cards=len(cards),  # 使用实际返回的卡牌数量
-            api_provider=api_provider
-        )
+        # 直接构建与Card/SearchResponse结构相同的字典交给orjson序列化，
+        # 省去逐张卡牌的Pydantic模型构建和校验（模型仅用于接口文档）
+        # compact模式下省略规则文本，它通常占响应体积的大部分
+        compact = request.compact
+        cards = [
+            {
+                "name": card_data.get("name", ""),
+                "mana_cost": card_data.get("mana_cost"),
+                "type_line": card_data.get("type_line", ""),
+                "oracle_text": "" if compact else card_data.get("oracle_text", ""),
+                "image_uris": card_data.get("image_uris"),
+                "scryfall_uri": card_data.get("scryfall_uri", ""),
+                "rarity": card_data.get("rarity", "")
+            }
+            for card_data in scryfall_result.get("data", [])
+        ]
+
+        logger.debug("搜索完成，返回所有 %d 张卡牌", len(cards))
+        body = orjson.dumps({
+            "cards": cards,
+            "scryfall_query": scryfall_query,
+            "total_cards": len(cards),  # 使用实际返回的卡牌数量
+            "api_provider": api_provider
+        })
+        # 本地映射的翻译和失败/不完整的Scryfall结果不缓存，下次请求重新尝试
+        if (api_provider != "fallback" and scryfall_result.get("complete")
+                and len(body) <= _SEARCH_RESPONSE_MAX_BODY_BYTES):
+            _search_response_cache[response_cache_key] = body
+        return Response(content=body, media_type="application/json")
 
     except HTTPException:
         # 重新抛出HTTP异常
         raise
     except Exception as e:
-        print(f"Search error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Search error: %s", e)
         raise HTTPException(status_code=500, detail=f"搜索失败: {str(e)}")
+
+# 管理接口的访问令牌，未配置时管理接口不可用
+_ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+def _check_admin_token(http_request: Request) -> None:
+    """校验X-Admin-Token请求头，未配置令牌或令牌不匹配时按接口不存在处理"""
+    token = http_request.headers.get("X-Admin-Token", "")
+    if not _ADMIN_TOKEN or not hmac.compare_digest(token.encode('utf-8'), _ADMIN_TOKEN.encode('utf-8')):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+@app.get("/api/admin/cache/stats")
+async def get_cache_stats(http_request: Request):
+    """缓存统计：搜索响应缓存的命中/未命中次数和各级缓存的当前大小（每个worker独立；
+    搜索响应按字节数、Scryfall按卡牌数、其余按条目数计）"""
+    _check_admin_token(http_request)
+    return {
+        "search_response": {**_search_cache_stats, "size": _search_response_cache.currsize},
+        "translation": {"size": _translation_cache.currsize},
+        "scryfall": {"size": _scryfall_cache.currsize},
+        "models": {"size": _models_cache.currsize}
+    }
@@ -1,9 +1,32 @@
 from fastapi import Request, Response, HTTPException
-from fastapi.responses import JSONResponse
 from .encryption import SimpleEncryption
-import json
+import logging
+import orjson
 import time
 
+logger = logging.getLogger(__name__)
+
+_ENCRYPTED_FIELD = b'"encrypted_data"'
+
+def _wrap_encrypted(response: Response, encrypted_response: str) -> Response:
+    """用加密后的数据构建新的响应，保留原响应的状态码和其他头部（包括CORS头部）"""
+    # 密文是base64（纯ASCII，无需转义），直接拼接外层JSON
+    payload = (
+        b'{"encrypted_data":"' + encrypted_response.encode('ascii')
+        + b'","timestamp":' + str(time.time_ns() // 1_000_000).encode('ascii') + b'}'
+    )
+    # 原响应的长度和类型不适用于新的响应体，由新响应重新生成
+    headers = {
+        key: value for key, value in response.headers.items()
+        if key not in ("content-length", "content-type")
+    }
+    return Response(
+        content=payload,
+        status_code=response.status_code,
+        headers=headers,
+        media_type="application/json"
+    )
+
 async def encryption_middleware(request: Request, call_next):
     """加密中间件 - 处理加密的请求和响应"""
     
@@ -14,98 +37,92 @@ async def encryption_middleware(request: Request, call_next):
     
     # 检查是否需要加密处理
     client_version = request.headers.get("X-Client-Version")
-    print(f"中间件处理请求: {request.method} {request.url.path}, 客户端版本: {client_version}")
+    logger.debug("中间件处理请求: %s %s, 客户端版本: %s", request.method, request.url.path, client_version)
     
     if not client_version:
         # 如果没有版本头，按普通请求处理
         response = await call_next(request)
         return response
     
+    # 客户端声明AES协议版本时使用AES-GCM，否则沿用XOR方案
+    use_aes = False
+
     try:
         # 解密请求数据
         if request.method in ["POST", "PUT", "PATCH"]:
             body = await request.body()
-            if body:
+            # 先在原始字节里查找加密字段名，普通明文请求不做JSON解析
+            if body and _ENCRYPTED_FIELD in body:
                 try:
-                    request_data = json.loads(body.decode('utf-8'))
+                    request_data = orjson.loads(body)
                     
                     # 检查是否是加密请求
                     if 'encrypted_data' in request_data:
                         # 验证时间戳（放宽时间限制）
                         timestamp = request_data.get('timestamp', 0)
                         if not SimpleEncryption.verify_timestamp(timestamp, max_age=600000):  # 10分钟
-                            print(f"时间戳验证失败: {timestamp}")
+                            logger.warning("时间戳验证失败: %s", timestamp)
                             # 不抛出异常，继续处理
                         
                         # 验证签名
                         signature = request_data.get('signature', '')
                         try:
-                            decrypted_data = SimpleEncryption.decrypt(request_data['encrypted_data'])
-                            if not SimpleEncryption.verify_signature(decrypted_data, timestamp, signature):
-                                print(f"签名验证失败")
+                            # 解密结果本身就是JSON字节，签名验证和替换请求体共用这一份
+                            use_aes = request_data.get('version') == SimpleEncryption.AES_VERSION
+                            if use_aes:
+                                decrypted_body = SimpleEncryption.decrypt_aes_bytes(request_data['encrypted_data'])
+                            else:
+                                decrypted_body = SimpleEncryption.decrypt_bytes(request_data['encrypted_data'])
+                            if not SimpleEncryption.verify_signature_bytes(decrypted_body, timestamp, signature):
+                                logger.warning("签名验证失败")
                                 # 不抛出异常，继续处理
-                            
+
                             # 替换请求体
-                            request._body = json.dumps(decrypted_data).encode('utf-8')
+                            request._body = decrypted_body
+                        except ValueError as decrypt_error:
+                            if use_aes:
+                                # AES-GCM校验失败说明密文被篡改，直接拒绝，不能按原始数据继续处理
+                                logger.warning("AES密文校验失败: %s", decrypt_error)
+                                return Response(
+                                    content=orjson.dumps({"detail": "请求解密失败"}),
+                                    status_code=400,
+                                    media_type="application/json"
+                                )
+                            logger.warning("解密失败: %s", decrypt_error)
+                            # 如果解密失败，继续使用原始数据
                         except Exception as decrypt_error:
-                            print(f"解密失败: {decrypt_error}")
+                            logger.warning("解密失败: %s", decrypt_error)
                             # 如果解密失败，继续使用原始数据
                         
                 except Exception as e:
-                    print(f"请求处理失败: {e}")
+                    logger.warning("请求处理失败: %s", e)
                     # 不抛出异常，继续处理
         
         # 处理请求
         response = await call_next(request)
         
-        # 加密响应数据
+        # 加密响应数据：响应体本身就是JSON字节，直接加密，不再解析后重新序列化
         if hasattr(response, 'body') and response.body:
             try:
-                response_data = json.loads(response.body.decode('utf-8'))
-                encrypted_response = SimpleEncryption.encrypt(response_data)
-                
-                # 创建新的响应，确保保留CORS头部
-                headers = dict(response.headers)
-                # 确保CORS头部存在
-                headers["Access-Control-Allow-Origin"] = "https://mtg-ai-frontend.onrender.com"
-                headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
-                headers["Access-Control-Allow-Headers"] = "*"
-                headers["Access-Control-Allow-Credentials"] = "true"
+                if not response.headers.get("content-type", "").startswith("application/json"):
+                    raise ValueError("响应不是JSON")
+                if use_aes:
+                    encrypted_response = SimpleEncryption.encrypt_aes_raw(response.body)
+                else:
+                    encrypted_response = SimpleEncryption.encrypt_raw(response.body)
                 
-                print(f"成功加密响应，状态码: {response.status_code}")
-                return JSONResponse(
-                    content={
-                        "encrypted_data": encrypted_response,
-                        "timestamp": int(time.time() * 1000)
-                    },
-                    status_code=response.status_code,
-                    headers=headers
-                )
+                logger.debug("成功加密响应，状态码: %s", response.status_code)
+                return _wrap_encrypted(response, encrypted_response)
             except Exception as e:
-                print(f"加密响应失败: {e}")
-                # 如果加密失败，返回原始响应但确保CORS头部
-                try:
-                    response_data = json.loads(response.body.decode('utf-8'))
-                except:
-                    response_data = {"error": "Failed to parse response"}
-                
-                headers = dict(response.headers)
-                headers["Access-Control-Allow-Origin"] = "https://mtg-ai-frontend.onrender.com"
-                headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
-                headers["Access-Control-Allow-Headers"] = "*"
-                headers["Access-Control-Allow-Credentials"] = "true"
-                
-                print(f"返回未加密响应，状态码: {response.status_code}")
-                return JSONResponse(
-                    content=response_data,
-                    status_code=response.status_code,
-                    headers=headers
-                )
+                logger.warning("加密响应失败: %s", e)
+                # 如果加密失败，返回原始响应（CORS头部由CORSMiddleware统一添加）
+                logger.debug("返回未加密响应，状态码: %s", response.status_code)
+                return response
         
         return response
         
     except Exception as e:
-        print(f"中间件处理失败: {e}")
+        logger.warning("中间件处理失败: %s", e)
         # 如果处理失败，按普通请求处理
         response = await call_next(request)
         return response
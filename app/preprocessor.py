@@ -1,7 +1,65 @@
 import re
-import json
+import functools
+import logging
 import os
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Tuple
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# 常见的MTG英文俚语 → 标准说法
+_EN_SLANG_MAP = {
+    "hate bears": "2/2 creatures with disruptive abilities",
+    "bolt test": "creatures that can be killed by Lightning Bolt",
+    "dies to removal": "creatures easily removed",
+    "dork": "small utility creatures",
+    "fatty": "large expensive creatures",
+    "evasion": "flying, menace, or unblockable",
+    "removal": "destroy or exile effects",
+    "cantrip": "spells that draw a card",
+    "wrath": "destroy all creatures",
+    "burn": "direct damage spells",
+    "engine": "cards that generate card advantage",
+    "value": "card advantage effects",
+    "curve": "mana curve considerations",
+    "tempo": "time advantage strategies",
+    "aggro": "aggressive low-cost strategies",
+    "control": "defensive control strategies",
+    "combo": "combination strategies",
+    "midrange": "medium-cost strategies",
+    "finisher": "game-winning cards",
+    "staple": "commonly used cards"
+}
+
+# 常见的MTG术语缩写 → 完整说法
+_EN_ABBREV_MAP = {
+    "cmc": "mana value",
+    "mv": "mana value",
+    "pow": "power",
+    "tou": "toughness",
+    "pt": "power and toughness",
+    "loy": "loyalty",
+    "kw": "keyword",
+    "o:": "oracle text:",
+    "c:": "color:",
+    "t:": "type:",
+    "r:": "rarity:",
+    "is:": "special:"
+}
+
+
+def _compile_alternation(mapping: Dict[str, str]) -> re.Pattern:
+    """把映射表的键合并成一个正则（长键优先），一次扫描完成全部替换
+
+    替换后的文本不会再被同一张表中的其他键匹配，避免"c:"→"color:"后又被"r:"改写。
+    """
+    keys = sorted(mapping, key=len, reverse=True)
+    return re.compile("|".join(re.escape(key) for key in keys))
+
+
+_EN_SLANG_RE = _compile_alternation(_EN_SLANG_MAP)
+_EN_ABBREV_RE = _compile_alternation(_EN_ABBREV_MAP)
+
 
 class MTGPreprocessor:
     """MTG术语预处理器，用于将中文/俚语转换为标准英文术语"""
@@ -14,6 +72,7 @@ class MTGPreprocessor:
         """
         self.glossary_path = glossary_path
         self.glossary = self._load_glossary()
+        self.regex_rules = self._compile_regex_rules()
         
     def _load_glossary(self) -> Dict[str, Any]:
         """加载术语词典"""
@@ -22,12 +81,23 @@ class MTGPreprocessor:
             current_dir = os.path.dirname(os.path.abspath(__file__))
             glossary_file = os.path.join(current_dir, "..", self.glossary_path)
             
-            with open(glossary_file, "r", encoding="utf-8") as f:
-                return json.load(f)
+            # 按字节一次读入后交给orjson解析，省去文本解码
+            with open(glossary_file, "rb") as f:
+                return orjson.loads(f.read())
         except Exception as e:
-            print(f"加载术语词典失败: {e}")
+            logger.warning("加载术语词典失败: %s", e)
             return {"terms": {}, "regex_rules": []}
     
+    def _compile_regex_rules(self) -> List[Tuple[re.Pattern, str]]:
+        """预编译词典中的正则规则，避免每次预处理都查找正则缓存"""
+        compiled = []
+        for rule in self.glossary.get("regex_rules", []):
+            try:
+                compiled.append((re.compile(rule["pattern"], flags=re.IGNORECASE), rule["replacement"]))
+            except Exception as e:
+                logger.warning("正则规则编译失败 %s: %s", rule.get("pattern"), e)
+        return compiled
+    
     def preprocess_input(self, user_input: str, language: str = "zh") -> str:
         """预处理用户输入
         
@@ -43,72 +113,30 @@ class MTGPreprocessor:
         if language == "zh":
             # 中文输入：术语替换 + 正则表达式
             # 1. 正则表达式替换（处理模糊/俚语表达）
-            for rule in self.glossary.get("regex_rules", []):
+            for pattern, replacement in self.regex_rules:
                 try:
-                    pattern = rule["pattern"]
-                    replacement = rule["replacement"]
-                    text = re.sub(pattern, replacement, text, flags=re.IGNORECASE)
+                    text = pattern.sub(replacement, text)
                 except Exception as e:
-                    print(f"正则替换失败 {pattern}: {e}")
+                    logger.warning("正则替换失败 %s: %s", pattern.pattern, e)
                     continue
             
             # 2. 术语替换（处理一一对应的术语）
+            # 大部分术语不会出现在查询中，先用in判断，跳过无效的replace调用
             for term, replacement in self.glossary.get("terms", {}).items():
                 try:
-                    text = text.replace(term, replacement)
+                    if term in text:
+                        text = text.replace(term, replacement)
                 except Exception as e:
-                    print(f"术语替换失败 {term}: {e}")
+                    logger.warning("术语替换失败 %s: %s", term, e)
                     continue
                     
         elif language == "en":
             # 英文输入：标准化MTG俚语和术语
-            # 1. 处理常见的MTG俚语
-            english_slang_mapping = {
-                "hate bears": "2/2 creatures with disruptive abilities",
-                "bolt test": "creatures that can be killed by Lightning Bolt",
-                "dies to removal": "creatures easily removed",
-                "dork": "small utility creatures",
-                "fatty": "large expensive creatures",
-                "evasion": "flying, menace, or unblockable",
-                "removal": "destroy or exile effects",
-                "cantrip": "spells that draw a card",
-                "wrath": "destroy all creatures",
-                "burn": "direct damage spells",
-                "engine": "cards that generate card advantage",
-                "value": "card advantage effects",
-                "curve": "mana curve considerations",
-                "tempo": "time advantage strategies",
-                "aggro": "aggressive low-cost strategies",
-                "control": "defensive control strategies",
-                "combo": "combination strategies",
-                "midrange": "medium-cost strategies",
-                "finisher": "game-winning cards",
-                "staple": "commonly used cards"
-            }
-            
-            # 2. 应用英文俚语替换
-            for slang, standard in english_slang_mapping.items():
-                text = text.replace(slang, standard)
-            
-            # 3. 处理常见的MTG术语缩写
-            abbreviation_mapping = {
-                "cmc": "mana value",
-                "mv": "mana value",
-                "pow": "power",
-                "tou": "toughness",
-                "pt": "power and toughness",
-                "loy": "loyalty",
-                "kw": "keyword",
-                "o:": "oracle text:",
-                "c:": "color:",
-                "t:": "type:",
-                "r:": "rarity:",
-                "is:": "special:"
-            }
+            # 1. 应用英文俚语替换（一次扫描，长词优先）
+            text = _EN_SLANG_RE.sub(lambda match: _EN_SLANG_MAP[match.group(0)], text)
             
-            # 4. 应用缩写替换
-            for abbrev, full in abbreviation_mapping.items():
-                text = text.replace(abbrev, full)
+            # 2. 应用缩写替换（在俚语替换之后，同样一次扫描）
+            text = _EN_ABBREV_RE.sub(lambda match: _EN_ABBREV_MAP[match.group(0)], text)
         
         return text
     
@@ -157,8 +185,9 @@ class MTGPreprocessor:
 # 创建全局预处理器实例
 mtg_preprocessor = MTGPreprocessor()
 
+@functools.lru_cache(maxsize=2048)
 def preprocess_mtg_query(user_input: str, language: str = "zh") -> str:
-    """便捷函数：预处理MTG查询
+    """便捷函数：预处理MTG查询（术语词典启动时加载后不再变化，结果可以缓存）
     
     Args:
         user_input: 用户输入
@@ -1,7 +1,13 @@
-import json
+import orjson
 import base64
+import functools
+import logging
+import math
 import time
 from typing import Any, Dict, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
 
 class SimpleEncryption:
     """简化的API密钥保护工具"""
@@ -11,70 +17,101 @@ class SimpleEncryption:
     
     @staticmethod
     def _simple_mask(data: str, key: str) -> str:
-        """简单的混淆"""
-        masked = ""
-        key_length = len(key)
-        for i, char in enumerate(data):
-            key_char = key[i % key_length]
-            masked += chr(ord(char) ^ ord(key_char))
-        return masked
+        """简单的混淆：每个字符（码位）与对应的密钥字符异或
+
+        UTF-32编码下每个码位固定占4个字节，按码位整体异或，结果与逐字符异或完全相同，
+        但不再逐字符拼接字符串：短数据用一次大整数XOR，长数据用NumPy按uint32向量化处理。
+        """
+        if not data:
+            return ""
+        count = len(data)
+        data_bytes = data.encode('utf-32-le', 'surrogatepass')
+        if count < _MASK_NUMPY_MIN_CHARS:
+            # 短数据：NumPy调用开销占主导，用一次大整数XOR（密钥字节取自预先平铺好的缓冲区）
+            key_bytes = _mask_key_tile_bytes(key)[:len(data_bytes)]
+            xored = int.from_bytes(data_bytes, 'little') ^ int.from_bytes(key_bytes, 'little')
+            return xored.to_bytes(len(data_bytes), 'little').decode('utf-32-le', 'surrogatepass')
+        
+        # 长数据：按密钥缓冲区长度分块做向量化XOR，每块都从密钥开头对齐
+        key_tile = _mask_key_tile(key)
+        tile_size = len(key_tile)
+        data_arr = np.frombuffer(data_bytes, dtype='<u4')
+        result = np.empty_like(data_arr)
+        blocks = count // tile_size
+        bulk = blocks * tile_size
+        if blocks:
+            np.bitwise_xor(data_arr[:bulk].reshape(blocks, tile_size), key_tile,
+                           out=result[:bulk].reshape(blocks, tile_size))
+        np.bitwise_xor(data_arr[bulk:], key_tile[:count - bulk], out=result[bulk:])
+        return result.tobytes().decode('utf-32-le', 'surrogatepass')
     
     @staticmethod
     def encrypt(data: Any) -> str:
         """加密数据"""
         try:
-            print(f"🔐 开始加密数据: {type(data)}")
-            print(f"🔐 原始数据: {json.dumps(data, ensure_ascii=False, indent=2)}")
+            logger.debug("🔐 开始加密数据: %s", type(data))
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("🔐 原始数据: %s", orjson.dumps(data, option=orjson.OPT_INDENT_2).decode('utf-8'))
             
             # 转换为JSON字符串
-            json_str = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
-            print(f"📄 JSON字符串长度: {len(json_str)}")
-            print(f"📄 JSON字符串样本: {repr(json_str[:100])}...")
+            json_str = orjson.dumps(data).decode('utf-8')
+            logger.debug("📄 JSON字符串长度: %s", len(json_str))
+            logger.debug("📄 JSON字符串样本: %r...", json_str[:100])
             
             # 简单混淆
             masked = SimpleEncryption._simple_mask(json_str, SimpleEncryption.MASK_KEY)
-            print(f"🔑 混淆完成，长度: {len(masked)}")
-            print(f"🔑 混淆字符串样本: {repr(masked[:50])}...")
+            logger.debug("🔑 混淆完成，长度: %s", len(masked))
+            logger.debug("🔑 混淆字符串样本: %r...", masked[:50])
             
             # Base64编码
-            result = base64.b64encode(masked.encode('utf-8')).decode('utf-8')
-            print(f"✅ Base64编码完成，最终长度: {len(result)}")
-            print(f"✅ 最终结果样本: {result[:50]}...")
+            result = base64.b64encode(masked.encode('utf-8')).decode('ascii')
+            logger.debug("✅ Base64编码完成，最终长度: %s", len(result))
+            logger.debug("✅ 最终结果样本: %s...", result[:50])
             return result
         except Exception as e:
-            print(f"❌ 加密失败: {type(e).__name__}: {e}")
-            import traceback
-            print(f"🔍 错误堆栈: {traceback.format_exc()}")
+            logger.warning("❌ 加密失败: %s: %s", type(e).__name__, e)
+            logger.debug("🔍 错误堆栈", exc_info=True)
             raise
     
     @staticmethod
-    def decrypt(encrypted_data: str) -> Any:
-        """解密数据"""
+    def decrypt_to_bytes(encrypted_data: str) -> bytes:
+        """解密数据，返回JSON原始字节（不做解析，可直接作为请求体）"""
         try:
-            print(f"🔓 开始解密数据，长度: {len(encrypted_data)}")
-            print(f"🔓 加密数据样本: {encrypted_data[:100]}...")
+            logger.debug("🔓 开始解密数据，长度: %s", len(encrypted_data))
+            logger.debug("🔓 加密数据样本: %s...", encrypted_data[:100])
             
             # Base64解码
-            decoded_bytes = base64.b64decode(encrypted_data.encode('utf-8'))
+            decoded_bytes = base64.b64decode(encrypted_data.encode('ascii', 'ignore'))
             decoded = decoded_bytes.decode('utf-8')
-            print(f"📄 Base64解码完成，字符串长度: {len(decoded)}")
-            print(f"📄 解码字符串样本: {repr(decoded[:50])}...")
+            logger.debug("📄 Base64解码完成，字符串长度: %s", len(decoded))
+            logger.debug("📄 解码字符串样本: %r...", decoded[:50])
             
             # 简单解混淆
             unmasked = SimpleEncryption._simple_mask(decoded, SimpleEncryption.MASK_KEY)
-            print(f"🔑 解混淆完成，长度: {len(unmasked)}")
-            print(f"🔑 解混淆字符串样本: {repr(unmasked[:100])}...")
-            
+            logger.debug("🔑 解混淆完成，长度: %s", len(unmasked))
+            logger.debug("🔑 解混淆字符串样本: %r...", unmasked[:100])
+            return unmasked.encode('utf-8')
+        except Exception as e:
+            logger.warning("❌ 解密失败: %s: %s", type(e).__name__, e)
+            logger.debug("🔍 解密数据: %s...", encrypted_data[:100])
+            logger.debug("🔍 错误堆栈", exc_info=True)
+            raise
+    
+    @staticmethod
+    def decrypt(encrypted_data: str) -> Any:
+        """解密数据"""
+        json_bytes = SimpleEncryption.decrypt_to_bytes(encrypted_data)
+        try:
             # JSON解析
-            result = json.loads(unmasked)
-            print(f"✅ JSON解析完成，类型: {type(result)}")
-            print(f"✅ 解析结果: {json.dumps(result, ensure_ascii=False, indent=2)}")
+            result = orjson.loads(json_bytes)
+            logger.debug("✅ JSON解析完成，类型: %s", type(result))
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("✅ 解析结果: %s", orjson.dumps(result, option=orjson.OPT_INDENT_2).decode('utf-8'))
             return result
         except Exception as e:
-            print(f"❌ 解密失败: {type(e).__name__}: {e}")
-            print(f"🔍 解密数据: {encrypted_data[:100]}...")
-            import traceback
-            print(f"🔍 错误堆栈: {traceback.format_exc()}")
+            logger.warning("❌ 解密失败: %s: %s", type(e).__name__, e)
+            logger.debug("🔍 解密数据: %s...", encrypted_data[:100])
+            logger.debug("🔍 错误堆栈", exc_info=True)
             raise
     
     @staticmethod
@@ -88,6 +125,26 @@ class SimpleEncryption:
         encrypted_data = SimpleEncryption.encrypt(data)
         return {
             'encrypted_data': encrypted_data,
-            'timestamp': int(time.time() * 1000),
+            'timestamp': time.time_ns() // 1_000_000,  # 毫秒时间戳
             'version': '1.0'
         }
+
+
+_MASK_NUMPY_MIN_CHARS = 256  # 低于此长度时大整数XOR比NumPy更快
+_MASK_TILE_MIN_CHARS = 4096
+
+
+@functools.lru_cache(maxsize=8)
+def _mask_key_tile(key: str) -> np.ndarray:
+    """把密钥的码位重复平铺成不少于4096个、长度为密钥长度整数倍的uint32缓冲区"""
+    key_arr = np.frombuffer(key.encode('utf-32-le', 'surrogatepass'), dtype='<u4')
+    tile_size = len(key_arr) * math.ceil(_MASK_TILE_MIN_CHARS / len(key_arr))
+    tile = np.resize(key_arr, tile_size)
+    tile.flags.writeable = False
+    return tile
+
+
+@functools.lru_cache(maxsize=8)
+def _mask_key_tile_bytes(key: str) -> bytes:
+    """平铺后的密钥缓冲区的UTF-32字节，短数据的大整数XOR直接切片使用"""
+    return _mask_key_tile(key).tobytes()